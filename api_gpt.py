@@ -1,13 +1,47 @@
 import openai
 from openai import OpenAI
 import os
-import base64
+import time
 from dotenv import load_dotenv
+from functools import lru_cache
+from ingredient_cache import IngredientCache
+from ingredient_normalizer import IngredientNormalizer
+from image_preprocessing import preprocess_in_pool
 
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv("openai_api_key"))
 
+# Gleiche (oder mit ingredient_cache_perceptual=true auch ähnliche) Fotos werden ohne API-Aufruf beantwortet
+ingredient_cache = IngredientCache(
+    max_bytes=int(os.getenv("ingredient_cache_max_bytes", 20 * 1024 * 1024)),
+    perceptual=os.getenv("ingredient_cache_perceptual", "").lower() == "true"
+)
+
+# Lokale Zutaten-Erkennung (Lexikon mit deutschen Synonymen), spart den GPT-Aufruf für einfache Listen
+ingredient_normalizer = IngredientNormalizer()
+
+
+@lru_cache(maxsize=1024)
+def _translate_ingredients(zutaten):
+    """
+    Lässt von GPT unbekannte Zutaten in englische Spoonacular-Begriffe übersetzen.
+    Ergebnisse werden pro Zutaten-Tupel zwischengespeichert.
+    """
+    prompt = (
+        "Convert this list of food ingredients into clean, comma-separated English keywords for cooking APIs like Spoonacular:\n"
+        + ", ".join(zutaten)
+    )
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=150,
+        temperature=0.3
+    )
+    gpt_text = response.choices[0].message.content
+    return tuple(item.strip().lower() for item in gpt_text.split(","))
+
+
 def extract_ingredients_from_input(image_path: str = None, zutaten_liste: list = None) -> list:
     """
     Extrahiert eine cleane, englische Zutatenliste entweder aus einem Bild (Kühlschrankfoto)
@@ -21,8 +55,20 @@ def extract_ingredients_from_input(image_path: str = None, zutaten_liste: list =
     if image_path:
         # Bild analysieren und Zutaten erkennen
         with open(image_path, "rb") as img_file:
-            base64_img = base64.b64encode(img_file.read()).decode("utf-8")
+            image_bytes = img_file.read()
+
+        cached = ingredient_cache.get(image_bytes)
+        if cached is not None:
+            print(f"✅ Zutaten aus dem Cache: {ingredient_cache.report()}")
+            return cached
 
+        started = time.perf_counter()
+        # Verkleinern und neu kodieren spart Upload-Zeit und Vision-Tokens
+        bild = preprocess_in_pool(
+            image_bytes,
+            max_edge=int(os.getenv("image_max_edge", 1024)),
+            image_format=os.getenv("image_upload_format", "JPEG").upper()
+        )
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
@@ -35,7 +81,7 @@ def extract_ingredients_from_input(image_path: str = None, zutaten_liste: list =
                         },
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_img}"}
+                            "image_url": {"url": f"data:{bild['mime']};base64,{bild['base64']}"}
                         }
                     ]
                 }
@@ -44,24 +90,26 @@ def extract_ingredients_from_input(image_path: str = None, zutaten_liste: list =
             temperature=0.3
         )
         gpt_text = response.choices[0].message.content
-        return [item.strip().lower() for item in gpt_text.split(",")]
+        zutaten = [item.strip().lower() for item in gpt_text.split(",")]
+
+        tokens = response.usage.total_tokens if getattr(response, "usage", None) else 0
+        print(f"Bildanalyse: {time.perf_counter() - started:.2f}s gesamt, davon {bild['seconds']:.2f}s Vorverarbeitung, {tokens} Tokens")
+        ingredient_cache.put(image_bytes, zutaten, latency=time.perf_counter() - started, tokens=tokens)
+        return zutaten
 
     if zutaten_liste:
-        # Falls String übergeben wurde (nicht Liste), umwandeln
-        if isinstance(zutaten_liste, str):
-            zutaten_liste = [z.strip() for z in zutaten_liste.split(",")]
+        # Bekannte Zutaten lokal normalisieren, nur unbekannte Begriffe gehen an GPT
+        bekannt, unbekannt = ingredient_normalizer.normalize(zutaten_liste)
+        ingredient_normalizer.record(needed_remote=bool(unbekannt))
+        if not unbekannt:
+            print(f"✅ Zutaten lokal erkannt: {bekannt}")
+            return bekannt
 
-        prompt = (
-            "Convert this list of food ingredients into clean, comma-separated English keywords for cooking APIs like Spoonacular:\n"
-            + ", ".join(zutaten_liste)
-        )
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150,
-            temperature=0.3
-        )
-        gpt_text = response.choices[0].message.content
-        return [item.strip().lower() for item in gpt_text.split(",")]
+        zutaten = list(bekannt)
+        for zutat in _translate_ingredients(tuple(unbekannt)):
+            if zutat and zutat not in zutaten:
+                zutaten.append(zutat)
+        print(f"GPT für unbekannte Zutaten {unbekannt} genutzt: {ingredient_normalizer.report()}")
+        return zutaten
 
     return []
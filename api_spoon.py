@@ -1,24 +1,90 @@
 import requests
 import os
-import json
-from datetime import datetime
+import http_client
+from concurrent.futures import ThreadPoolExecutor
+from recipe import Recipe
+from recipe_cache import RecipeCache
+from search_cache import SearchCache
+import spoon_quota
+import recipe_index
+from spoon_quota import QuotaTracker
 
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
+# Überschreibbar, z.B. für den lokalen Stub-Server (spoonacular_stub.py)
+SPOONACULAR_BASE_URL = os.getenv("SPOONACULAR_BASE_URL", "https://api.spoonacular.com")
+# Maximale Anzahl gleichzeitiger Detail-Abrufe, falls der Bulk-Endpunkt nicht verfügbar ist
+MAX_PARALLEL_DETAILS = int(os.getenv("SPOONACULAR_MAX_PARALLEL", 5))
 
-def find_recipes_by_ingredients(ingredients, number=3, ranking=1, ignore_pantry=True):
+# Persistenter Cache der normalisierten Rezeptdetails, beliebte Rezepte kosten so nur einmal API-Punkte
+recipe_cache = RecipeCache(
+    ttl_seconds=int(os.getenv("RECIPE_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=int(os.getenv("RECIPE_CACHE_MAX_ENTRIES", 5000))
+)
+
+# Cache der Suchergebnisse, "tomato, cheese" und "cheese, tomato" sind dieselbe Anfrage
+search_cache = SearchCache(
+    ttl_seconds=int(os.getenv("SEARCH_CACHE_TTL", 6 * 3600)),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1000)),
+    allow_approximate=os.getenv("SEARCH_CACHE_APPROXIMATE", "").lower() == "true"
+)
+
+# Verbrauchte API-Punkte pro Tag, bei knappem Budget wird stufenweise reduziert
+quota = QuotaTracker(daily_budget=float(os.getenv("SPOONACULAR_DAILY_POINTS", 150)))
+# Bei reduziertem Budget maximal so viele Rezeptvorschläge
+REDUZIERTE_ANZAHL = 2
+
+# Lokaler Rezeptindex (python recipe_index.py build), beantwortet Suchen ohne API-Punkte
+local_index = recipe_index.load_index(os.getenv("RECIPE_INDEX_PATH", recipe_index.DEFAULT_PATH))
+# Wenn True, wird zuerst lokal gesucht und die API nur für die Details verwendet
+LOKAL_ZUERST = os.getenv("RECIPE_INDEX_LOCAL_FIRST", "").lower() == "true"
+
+def _spoonacular_get(url, params):
+    """
+    GET-Anfrage an Spoonacular, die verbrauchten Punkte werden aus den Quota-Headern mitgezählt.
+    """
+    response = http_client.get(url, params=params)
+    quota.record(response)
+    return response
+
+def find_recipes_by_ingredients(ingredients, number=3, ranking=1, ignore_pantry=True, prioritaet="interactive"):
     """
     Sucht nach Rezepten basierend auf einer Liste von Zutaten.
+    Ergebnisse werden pro (sortierter) Zutatenmenge zwischengespeichert, gleichzeitige
+    identische Anfragen teilen sich einen API-Aufruf. Liefert die API nichts (Fehler oder
+    Budget erschöpft), wird im lokalen Rezeptindex gesucht.
 
     Args:
         ingredients (list[str]): Liste der Zutaten (z.B. ["tomato", "cheese", "bread"]).
         number (int): Anzahl der gewünschten Rezepte.
         ranking (int): 1 = beste Übereinstimmung zuerst, 2 = maximale Verwendung der Zutaten.
         ignore_pantry (bool): Ob Vorratskammer-Zutaten ignoriert werden sollen.
+        prioritaet (str): "interactive" oder "background" - Hintergrundarbeit wird früher gedrosselt.
 
     Returns:
         list[dict]: Liste der Rezeptdaten.
     """
-    url = "https://api.spoonacular.com/recipes/findByIngredients"
+    if LOKAL_ZUERST and local_index is not None:
+        ergebnisse = local_index.search(ingredients, number, ranking, ignore_pantry)
+        if len(ergebnisse) >= number:
+            return ergebnisse
+
+    suchen = _rezepte_suchen
+    if quota.level(prioritaet) >= spoon_quota.CACHE_ONLY:
+        # Budget aufgebraucht: nur noch Antworten aus dem Cache
+        print(f"Spoonacular-Budget erschöpft ({quota.report()}), nur Cache-Antworten")
+        suchen = lambda *args: None
+    ergebnisse = search_cache.get_or_fetch(ingredients, number, ranking, ignore_pantry, suchen)
+
+    if not ergebnisse and local_index is not None:
+        ergebnisse = local_index.search(ingredients, number, ranking, ignore_pantry)
+        print(f"{len(ergebnisse)} Rezepte aus dem lokalen Index")
+    return ergebnisse
+
+def _rezepte_suchen(ingredients, number, ranking, ignore_pantry):
+    """
+    Ruft findByIngredients bei Spoonacular auf. Gibt bei Fehlern None zurück (wird nicht gecacht).
+    """
+    url = f"{SPOONACULAR_BASE_URL}/recipes/findByIngredients"
     params = {
         "ingredients": ",".join(ingredients),
         "number": number,
@@ -27,48 +93,148 @@ def find_recipes_by_ingredients(ingredients, number=3, ranking=1, ignore_pantry=
         "apiKey": SPOONACULAR_API_KEY
     }
 
-    response = requests.get(url, params=params)
+    try:
+        response = _spoonacular_get(url, params)
+    except requests.RequestException as e:
+        print(f"Fehler bei Rezeptsuche: {e}")
+        return None
+
     if response.status_code != 200:
         print(f"Fehler bei Rezeptsuche: {response.status_code}")
-        return []
+        return None
 
     return response.json()
 
-def get_detailed_recipes(ingredients, number=3):
+def _details_einzeln_abrufen(rezept_id, mit_naehrwerten=True):
     """
-    Führt eine erweiterte Rezeptsuche durch, inklusive Gesundheitsdaten, Rezeptlink und Anleitung.
+    Ruft die Details eines einzelnen Rezepts ab.
+
+    Returns:
+        tuple: (Rezeptdaten oder None, Fehlermeldung oder None)
+    """
+    detail_url = f"{SPOONACULAR_BASE_URL}/recipes/{rezept_id}/information"
+    detail_params = {
+        "includeNutrition": str(mit_naehrwerten).lower(),
+        "apiKey": SPOONACULAR_API_KEY
+    }
+
+    try:
+        detail_response = _spoonacular_get(detail_url, detail_params)
+    except requests.RequestException as e:
+        return None, str(e)
+
+    if detail_response.status_code != 200:
+        return None, f"HTTP {detail_response.status_code}"
+    return Recipe.from_spoonacular(detail_response.json()), None
+
+def get_recipe_details(rezept_ids, mit_naehrwerten=True, nur_cache=False, prioritaet=None):
+    """
+    Ruft die Details mehrerer Rezepte ab - zuerst aus dem Rezept-Cache, der Rest mit einem Aufruf
+    des Bulk-Endpunkts; fehlende Rezepte werden parallel (höchstens MAX_PARALLEL_DETAILS gleichzeitig)
+    einzeln nachgeladen.
+
+    Args:
+        rezept_ids (list[int]): Spoonacular-Rezept-IDs.
+        mit_naehrwerten (bool): Nährwerte mit abrufen (kostet zusätzliche API-Punkte).
+        nur_cache (bool): Keine API-Aufrufe, nicht gecachte Rezepte werden als Fehler gemeldet.
+        prioritaet (str): Wenn gesetzt, werden Nährwerte und API-Aufrufe je nach Budget-Stufe
+            dieser Priorität weggelassen.
+
+    Returns:
+        tuple: (Liste der Rezepte (Recipe) in der Reihenfolge der IDs, Liste der Fehler als {"id", "fehler"})
     """
-    rezepte = find_recipes_by_ingredients(ingredients, number=number)
-    ergebnisse = []
+    if prioritaet is not None:
+        stufe = quota.level(prioritaet)
+        mit_naehrwerten = mit_naehrwerten and stufe < spoon_quota.NO_NUTRITION
+        nur_cache = nur_cache or stufe >= spoon_quota.CACHE_ONLY
 
-    for rezept in rezepte:
-        rezept_id = rezept.get("id")
-        if not rezept_id:
-            continue
+    gefunden = {rezept_id: Recipe.from_dict(daten) for rezept_id, daten in recipe_cache.get_many(rezept_ids).items()}
+    abzurufen = [rezept_id for rezept_id in rezept_ids if rezept_id not in gefunden]
+    if nur_cache:
+        fehler = [{"id": rezept_id, "fehler": "Spoonacular-Budget erschöpft"} for rezept_id in abzurufen]
+        return [gefunden[rezept_id] for rezept_id in rezept_ids if rezept_id in gefunden], fehler
 
-        detail_url = f"https://api.spoonacular.com/recipes/{rezept_id}/information"
-        detail_params = {
-            "includeNutrition": "true",
+    if abzurufen:
+        bulk_url = f"{SPOONACULAR_BASE_URL}/recipes/informationBulk"
+        bulk_params = {
+            "ids": ",".join(str(rezept_id) for rezept_id in abzurufen),
+            "includeNutrition": str(mit_naehrwerten).lower(),
             "apiKey": SPOONACULAR_API_KEY
         }
+        try:
+            bulk_response = _spoonacular_get(bulk_url, bulk_params)
+            if bulk_response.status_code == 200:
+                for detail_data in bulk_response.json():
+                    gefunden[detail_data.get("id")] = Recipe.from_spoonacular(detail_data)
+            else:
+                print(f"Bulk-Abruf fehlgeschlagen ({bulk_response.status_code}), lade Rezepte einzeln")
+        except requests.RequestException as e:
+            print(f"Bulk-Abruf fehlgeschlagen ({e}), lade Rezepte einzeln")
 
-        detail_response = requests.get(detail_url, params=detail_params)
-        if detail_response.status_code != 200:
-            print(f" Fehler beim Abrufen von Details für Rezept {rezept_id}")
-            continue
-
-        detail_data = detail_response.json()
-        daten = {
-            "rezeptname": detail_data.get("title"),
-            "bild_url": detail_data.get("image"),
-            "gesundheitsbewertung": detail_data.get("healthScore"),
-            "rezept_url": detail_data.get("sourceUrl"),
-            "video_url": detail_data.get("video", "Kein Video verfügbar"),
-            "zubereitung": [step["step"] for instruction in detail_data.get("analyzedInstructions", []) for step in instruction.get("steps", [])],
-            "zutaten": [z["original"] for z in detail_data.get("extendedIngredients", [])],
-            "nutrition": detail_data.get("nutrition", {})
-        }
+    fehlend = [rezept_id for rezept_id in rezept_ids if rezept_id not in gefunden]
+    fehler = []
+    if fehlend:
+        with ThreadPoolExecutor(max_workers=min(len(fehlend), MAX_PARALLEL_DETAILS)) as executor:
+            for rezept_id, (daten, fehlermeldung) in zip(fehlend, executor.map(lambda rezept_id: _details_einzeln_abrufen(rezept_id, mit_naehrwerten), fehlend)):
+                if daten:
+                    gefunden[rezept_id] = daten
+                else:
+                    print(f" Fehler beim Abrufen von Details für Rezept {rezept_id}: {fehlermeldung}")
+                    fehler.append({"id": rezept_id, "fehler": fehlermeldung})
+
+    neu = [gefunden[rezept_id] for rezept_id in abzurufen if rezept_id in gefunden]
+    recipe_cache.put_many([rezept.to_dict() for rezept in neu])
+    print(f"Rezept-Cache: {recipe_cache.stats()}")
+
+    ergebnisse = [gefunden[rezept_id] for rezept_id in rezept_ids if rezept_id in gefunden]
+    return ergebnisse, fehler
+
+def get_recipe_suggestions(ingredients, number=3, prioritaet="interactive"):
+    """
+    Schnelle Rezeptvorschläge: nur die Suche, Details werden nicht abgerufen.
+    Bereits gecachte Rezepte werden vollständig zurückgegeben, alle anderen als Zusammenfassung
+    aus dem Suchergebnis (details_geladen ist False), deren Details später mit
+    get_recipe_details geladen werden. Bei knappem Budget werden wie in
+    get_detailed_recipes weniger Rezepte vorgeschlagen.
+
+    Returns:
+        list[Recipe]: Rezepte in der Reihenfolge der Trefferliste.
+    """
+    stufe = quota.level(prioritaet)
+    if stufe >= spoon_quota.FEWER_CANDIDATES:
+        print(f"Spoonacular-Budget knapp, Stufe: {spoon_quota.LEVEL_NAMES[stufe]} ({quota.report()})")
+        number = min(number, REDUZIERTE_ANZAHL)
+
+    treffer = [t for t in find_recipes_by_ingredients(ingredients, number=number, prioritaet=prioritaet) if t.get("id")]
+    gecacht = recipe_cache.get_many([t["id"] for t in treffer])
+    return [Recipe.from_dict(gecacht[t["id"]]) if t["id"] in gecacht else Recipe.from_search_result(t) for t in treffer]
+
+def get_detailed_recipes(ingredients, number=3, mit_fehlern=False, prioritaet="interactive"):
+    """
+    Führt eine erweiterte Rezeptsuche durch, inklusive Gesundheitsdaten, Rezeptlink und Anleitung.
+    Die Reihenfolge entspricht der Trefferliste der Suche.
+
+    Je nach verbleibendem Spoonacular-Budget wird stufenweise reduziert:
+    weniger Rezepte, dann keine Nährwerte, dann nur noch Antworten aus dem Cache.
+
+    Args:
+        mit_fehlern (bool): Wenn True, wird (Rezepte, Fehler) zurückgegeben statt nur der Rezepte.
+        prioritaet (str): "interactive" oder "background".
+    """
+    stufe = quota.level(prioritaet)
+    if stufe > spoon_quota.FULL:
+        print(f"Spoonacular-Budget knapp, Stufe: {spoon_quota.LEVEL_NAMES[stufe]} ({quota.report()})")
+    if stufe >= spoon_quota.FEWER_CANDIDATES:
+        number = min(number, REDUZIERTE_ANZAHL)
 
-        ergebnisse.append(daten)
+    rezepte = find_recipes_by_ingredients(ingredients, number=number, prioritaet=prioritaet)
+    rezept_ids = [rezept.get("id") for rezept in rezepte if rezept.get("id")]
 
+    ergebnisse, fehler = get_recipe_details(
+        rezept_ids,
+        mit_naehrwerten=stufe < spoon_quota.NO_NUTRITION,
+        nur_cache=stufe >= spoon_quota.CACHE_ONLY
+    )
+    if mit_fehlern:
+        return ergebnisse, fehler
     return ergebnisse
@@ -1,13 +1,17 @@
 from twilio_whatsapp_client import WhatsAppBot
+from worker_pool import ConversationWorkerPool
+from session_store import SessionStore
 from data_manager import DataManager
 from api_gpt import extract_ingredients_from_input
-from api_spoon import find_recipes_by_ingredients, get_detailed_recipes
+from image_preprocessing import UnsupportedImageError
+from api_spoon import get_recipe_suggestions, get_recipe_details
+from recipe_loader import RecipeDetailLoader
 import re
 import random
 import os
 import threading
 from dotenv import load_dotenv
-from flask_app import app as flask_app
+from flask_app import app as flask_app, register_webhook_handler
 
 # Load environment variables
 load_dotenv()
@@ -17,15 +21,23 @@ data_manager = DataManager()
 
 class WhatsAppFoodApp:
     def __init__(self):
-        self.initial_processing_complete = False
         self.new_message_sids = set()
-        # Store last recipe suggestion for simple selection
-        self.last_suggested_recipes = []
-        self.bot = WhatsAppBot(message_callback=self.handle_message)
-        
-        # Current user tracking - use phone number from environment variable
-        self.current_user = os.environ.get("your_whatsapp")
-        print(f"Initializing app with user phone: {self.current_user}")
+        # Per-user state (last recipe suggestions for selection), keyed by WhatsApp address
+        self.sessions = SessionStore(
+            ttl_seconds=int(os.environ.get("session_ttl", 24 * 3600)),
+            max_sessions=int(os.environ.get("max_sessions", 10000)),
+            path=os.environ.get("session_store_path")
+        )
+        # Messages are handled on a worker pool so one slow GPT/Spoonacular call doesn't block other users
+        self.worker_pool = ConversationWorkerPool(
+            num_workers=int(os.environ.get("worker_count", 4)),
+            queue_size=int(os.environ.get("worker_queue_size", 100)),
+            name="message-worker"
+        )
+        self.bot = WhatsAppBot(message_callback=self.handle_message, worker_pool=self.worker_pool)
+        # Suggestions are sent from search results, full details are loaded in the background or on selection
+        self.recipe_loader = RecipeDetailLoader(lambda rezept_ids, prioritaet: get_recipe_details(rezept_ids, prioritaet=prioritaet))
+        self.prefetch_details = os.environ.get("prefetch_recipe_details", "true").lower() == "true"
     
     def handle_message(self, message):
         """Process incoming WhatsApp messages and implement business logic"""
@@ -37,37 +49,32 @@ class WhatsAppFoodApp:
         image_location = None
         message_sid = getattr(message, 'sid', 'unknown')
         
+        # Each sender gets their own session, replies go back to the sender's conversation
+        sender = getattr(message, 'author', None) or self.bot.your_whatsapp
+        session = self.sessions.get(sender, getattr(message, 'conversation_sid', None))
+        
         # Handle text message
         if hasattr(message, 'body'):
             print(f"📱 Message received: {message.body}")
             message_text = message.body
         
-        # If we're in the initial processing phase, only track message SIDs
-        # but don't download any images
-        if not self.initial_processing_complete:
-            # Just record that we've seen this message
-            if hasattr(message, 'media') or hasattr(message, 'media_items'):
-                print(f"⏭️ Skipping media download during initial processing: {message_sid}")
-            return
-        
-        # Once initial processing is complete, any new message should be fully processed
-        # Add this message to the set of new messages
+        # Track the SIDs handled in this session
         self.new_message_sids.add(message_sid)
         
         # Process the message based on content
         if message_text:
             # Check if this might be a recipe selection
-            if self.last_suggested_recipes and self._is_recipe_selection(message_text):
-                self._process_recipe_selection(message_text)
+            if session.last_suggested_recipes and self._is_recipe_selection(message_text):
+                self._process_recipe_selection(session, message_text)
                 return
             
             # If not a recipe selection, process as a regular text message
-            self._process_text_message(message_text, message_sid)
+            self._process_text_message(session, message_text, message_sid)
         else:
             # Process media content
             image_location = self._process_media_content(message)
             if image_location:
-                self._process_image(image_location, message_sid)
+                self._process_image(session, image_location, message_sid)
     
     def _is_recipe_selection(self, text):
         """Check if the text appears to be selecting a recipe"""
@@ -140,7 +147,7 @@ class WhatsAppFoodApp:
         
         return None
     
-    def _process_image(self, image_path, message_sid):
+    def _process_image(self, session, image_path, message_sid):
         """Process image, extract ingredients and suggest recipes"""
         print(f"Image saved at: {image_path}")
         print("Starting image analysis...")
@@ -167,46 +174,54 @@ class WhatsAppFoodApp:
                 humor_message = random.choice(humor_responses)
                 
                 response_message = f"{humor_message}\n\nPlease send a photo of food ingredients or list them in a text message like 'tomatoes, chicken, pasta'."
-                self.bot.send_message(response_message)
+                self.bot.send_message(response_message, session.conversation_sid)
                 return
                 
             # Get recipe suggestions
             try:
                 # Inform user we're looking for recipes
-                self.bot.send_message(f"I found these ingredients: {', '.join(zutatenliste)}\n\nLooking for recipes now...")
+                self.bot.send_message(f"I found these ingredients: {', '.join(zutatenliste)}\n\nLooking for recipes now...", session.conversation_sid, status=True)
                 
                 print(f"Calling Spoonacular API to find recipes for: {zutatenliste}")
-                rezepte = get_detailed_recipes(zutatenliste, number=3)
-                print(f"\nFound {len(rezepte)} detailed recipes")
+                rezepte = get_recipe_suggestions(zutatenliste, number=3)
+                print(f"\nFound {len(rezepte)} recipes")
                 
                 if not rezepte:
                     response_message = "Unfortunately, I couldn't find any recipes with these ingredients. Try different ingredients."
-                    self.bot.send_message(response_message)
+                    self.bot.send_message(response_message, session.conversation_sid)
                     return
                 
                 # Print recipe details for debugging
                 for i, rezept in enumerate(rezepte):
-                    print(f"Recipe {i+1}: {rezept.get('rezeptname')}")
-                    print(f"  Health Score: {rezept.get('gesundheitsbewertung')}")
-                    print(f"  URL: {rezept.get('rezept_url')}")
+                    print(f"Recipe {i+1}: {rezept.rezeptname}")
+                    print(f"  Health Score: {rezept.gesundheitsbewertung}")
+                    print(f"  URL: {rezept.rezept_url}")
                 
                 # Store the recipes for potential selection
-                self.last_suggested_recipes = rezepte
+                session.last_suggested_recipes = rezepte
+                session.state = "awaiting_selection"
+                self.sessions.save(session)
+                self._prefetch_details(rezepte)
                 
                 # Format and send recipe response
-                self._send_recipe_response(rezepte, zutatenliste)
+                self._send_recipe_response(session, rezepte, zutatenliste)
                 
             except Exception as e:
                 print(f"Error getting recipes: {str(e)}")
                 response_message = "I had trouble finding recipes. Please try again later."
-                self.bot.send_message(response_message)
+                self.bot.send_message(response_message, session.conversation_sid)
                 
+        except UnsupportedImageError as e:
+            print(f"Unsupported image: {e}")
+            response_message = "I can't read this image format. Please send the photo as JPEG or PNG."
+            self.bot.send_message(response_message, session.conversation_sid)
+            
         except Exception as e:
             print(f"Error extracting ingredients: {str(e)}")
             response_message = "I encountered an error analyzing your image. Please try again later."
-            self.bot.send_message(response_message)
+            self.bot.send_message(response_message, session.conversation_sid)
     
-    def _process_text_message(self, message_text, message_sid):
+    def _process_text_message(self, session, message_text, message_sid):
         """Process text message as ingredients list"""
         print(f"Text message: {message_text}")
         
@@ -244,68 +259,86 @@ class WhatsAppFoodApp:
                     humor_message = random.choice(humor_responses)
                     
                     response_message = f"{humor_message}\n\nPlease provide more ingredients (at least 2-3) separated by commas, like 'chicken, rice, carrots'."
-                    self.bot.send_message(response_message)
+                    self.bot.send_message(response_message, session.conversation_sid)
                     return
                 
                 if zutatenliste:
                     # Inform user we're looking for recipes
-                    self.bot.send_message("Looking for recipes with your ingredients...")
+                    self.bot.send_message("Looking for recipes with your ingredients...", session.conversation_sid, status=True)
                     
                     # Get recipe suggestions
-                    rezepte = get_detailed_recipes(zutatenliste, number=3)
+                    rezepte = get_recipe_suggestions(zutatenliste, number=3)
                     print(f"Found {len(rezepte)} recipes")
                     
                     if rezepte:
                         # Store recipes for potential selection
-                        self.last_suggested_recipes = rezepte
+                        session.last_suggested_recipes = rezepte
+                        session.state = "awaiting_selection"
+                        self.sessions.save(session)
+                        self._prefetch_details(rezepte)
                         
                         # Send the recipe options
-                        self._send_recipe_response(rezepte, zutatenliste)
+                        self._send_recipe_response(session, rezepte, zutatenliste)
                         return
                     else:
                         response_message = "I couldn't find any recipes with these ingredients. Try different ingredients or add more items to your list."
-                        self.bot.send_message(response_message)
+                        self.bot.send_message(response_message, session.conversation_sid)
                         return
                 else:
                     response_message = "I couldn't identify any food ingredients in your message. Please provide a list of ingredients separated by commas."
-                    self.bot.send_message(response_message)
+                    self.bot.send_message(response_message, session.conversation_sid)
                     return
         except Exception as e:
             print(f"Error processing text ingredients: {str(e)}")
             response_message = "I had trouble processing your message. Please try again with a clear list of ingredients."
-            self.bot.send_message(response_message)
+            self.bot.send_message(response_message, session.conversation_sid)
             return
         
         # Default response for other messages
         response_message = ("Hello! Send me a photo of your refrigerator or a list of ingredients (e.g., 'tomatoes, cheese, chicken'), "
                            "and I'll suggest matching recipes for you.")
-        self.bot.send_message(response_message)
+        self.bot.send_message(response_message, session.conversation_sid)
     
-    def _process_recipe_selection(self, message_text):
+    def _process_recipe_selection(self, session, message_text):
         """Process a recipe selection from the user"""
-        if not self.last_suggested_recipes:
+        if not session.last_suggested_recipes:
             # No recipes have been suggested
-            self.bot.send_message("I don't have any recent recipe suggestions. Please send me ingredients first.")
+            self.bot.send_message("I don't have any recent recipe suggestions. Please send me ingredients first.", session.conversation_sid)
             return
         
         # Extract the recipe number (1-3) from the message
         recipe_num = self._extract_recipe_number(message_text)
         
         # Validate the selection
-        if recipe_num > len(self.last_suggested_recipes):
-            self.bot.send_message("Sorry, I couldn't find that recipe. Please select from the options provided (1-3).")
+        if recipe_num > len(session.last_suggested_recipes):
+            self.bot.send_message("Sorry, I couldn't find that recipe. Please select from the options provided (1-3).", session.conversation_sid)
             return
         
         # Get the selected recipe (adjust for 0-based indexing)
-        selected_recipe = self.last_suggested_recipes[recipe_num - 1]
+        selected_recipe = session.last_suggested_recipes[recipe_num - 1]
+        
+        # Suggestions only carry the search summary, load the full recipe now (or join the prefetch)
+        if not selected_recipe.details_geladen:
+            details = self.recipe_loader.get(selected_recipe.id)
+            if details:
+                selected_recipe = details
+                session.last_suggested_recipes[recipe_num - 1] = details
+                self.sessions.save(session)
+            else:
+                print(f"Could not load details for recipe {selected_recipe.id}, sending the summary")
         
         # Save the recipe to the user's profile
-        data_manager.save_recipe_for_user(self.current_user, selected_recipe)
+        data_manager.save_recipe_for_user(session.address, selected_recipe)
         
         # Send the detailed recipe information
-        self._send_detailed_recipe(selected_recipe)
+        self._send_detailed_recipe(session, selected_recipe)
+    
+    def _prefetch_details(self, rezepte):
+        """Start loading full details of suggestions that only have the search summary"""
+        if self.prefetch_details:
+            self.recipe_loader.prefetch([rezept.id for rezept in rezepte if not rezept.details_geladen])
     
-    def _send_recipe_response(self, rezepte, zutatenliste):
+    def _send_recipe_response(self, session, rezepte, zutatenliste):
         """Format and send recipe suggestions to user"""
         ingredients_text = ", ".join(zutatenliste)
         
@@ -313,16 +346,20 @@ class WhatsAppFoodApp:
         response += "🍽️ *Here are 3 recipe suggestions for you:*\n\n"
         
         for i, rezept in enumerate(rezepte, 1):
-            rezeptname = rezept.get('rezeptname', 'Unknown Recipe')
-            gesundheitswert = rezept.get('gesundheitsbewertung', 'N/A')
-            rezept_url = rezept.get('rezept_url', '#')
-            zutaten = rezept.get('zutaten', [])
+            rezeptname = rezept.rezeptname
+            gesundheitswert = rezept.gesundheitsbewertung
+            rezept_url = rezept.rezept_url or '#'
+            zutaten = rezept.zutaten
             
-            # Format health score with emoji
-            health_emoji = "🟢" if gesundheitswert and gesundheitswert > 70 else "🟡" if gesundheitswert and gesundheitswert > 40 else "🟠"
-            
-            response += f"*{i}. {rezeptname}* {health_emoji}\n"
-            response += f"   Health Score: {gesundheitswert}/100\n"
+            if gesundheitswert is None:
+                # Summary without details yet, the health score comes with the full recipe
+                response += f"*{i}. {rezeptname}*\n"
+            else:
+                # Format health score with emoji
+                health_emoji = "🟢" if gesundheitswert and gesundheitswert > 70 else "🟡" if gesundheitswert and gesundheitswert > 40 else "🟠"
+                
+                response += f"*{i}. {rezeptname}* {health_emoji}\n"
+                response += f"   Health Score: {gesundheitswert}/100\n"
             
             # Add a preview of ingredients if available
             if zutaten and len(zutaten) > 0:
@@ -339,21 +376,22 @@ class WhatsAppFoodApp:
         response += "To see detailed instructions for a recipe, reply with the number (1, 2, or 3).\n"
         response += "Or send another photo or list of ingredients for new suggestions! 🍳"
         
-        self.bot.send_message(response)
+        self.bot.send_message(response, session.conversation_sid)
     
-    def _send_detailed_recipe(self, recipe):
+    def _send_detailed_recipe(self, session, recipe):
         """Send detailed recipe information to the user"""
-        rezeptname = recipe.get('rezeptname', 'Unknown Recipe')
-        gesundheitswert = recipe.get('gesundheitsbewertung', 'N/A')
-        rezept_url = recipe.get('rezept_url', '#')
-        zutaten = recipe.get('zutaten', [])
-        zubereitung = recipe.get('zubereitung', [])
+        rezeptname = recipe.rezeptname
+        gesundheitswert = recipe.gesundheitsbewertung
+        rezept_url = recipe.rezept_url or '#'
+        zutaten = recipe.zutaten
+        zubereitung = recipe.zubereitung
         
         # Create the detailed response
         response = f"🍲 *{rezeptname}*\n\n"
         
-        # Add health score
-        response += f"Health Score: {gesundheitswert}/100\n\n"
+        # Add health score (missing if only the search summary could be loaded)
+        if gesundheitswert is not None:
+            response += f"Health Score: {gesundheitswert}/100\n\n"
         
         # Add all ingredients
         response += "*Ingredients:*\n"
@@ -380,7 +418,7 @@ class WhatsAppFoodApp:
         # Add footer
         response += "Want to try another recipe? Send me new ingredients or a photo of your fridge! 🥗"
         
-        self.bot.send_message(response)
+        self.bot.send_message(response, session.conversation_sid)
     
     def run(self):
         """Run the application"""
@@ -388,28 +426,34 @@ class WhatsAppFoodApp:
             # Setup the WhatsApp conversation
             self.bot.setup_conversation()
             
-            print("\nStarting initial message processing (without downloading images)...")
-            # Initial processing - process all messages but don't download images
-            initial_messages = self.bot.process_recent_messages(limit=50)
-            if not initial_messages:
-                print("No messages found initially.")
-            else:
-                print(f"Processed {len(initial_messages)} message(s) during initialization.")
-            
-            # Set the flag to indicate we're done with initial processing
-            self.initial_processing_complete = True
-            print("\nInitial processing complete. Now downloading images for new messages only.")
+            # First start: mark the existing history as handled. Later starts resume
+            # from the stored cursor, so messages sent while the bot was down are answered.
+            skipped_messages = self.bot.bootstrap_history(limit=50)
+            if skipped_messages:
+                print(f"Marked {len(skipped_messages)} existing message(s) as already handled.")
             
-            print("\nStarting automatic message polling (every 5 seconds, last 50 messages)...")
+            if os.environ.get("webhook_enabled", "").lower() == "true":
+                # Messages arrive via /whatsapp/webhook, polling only reconciles missed events
+                interval = int(os.environ.get("reconcile_interval", 60))
+                print(f"\nWebhook enabled. Reconciliation polling every {interval} seconds...")
+            else:
+                interval = 5
+                print(f"\nStarting automatic message polling (every {interval} seconds, last 50 messages)...")
             print("Press Ctrl+C to stop polling.")
             
-            # Start automatic polling - process all messages but images only for new ones
-            self.bot.poll_for_new_messages(interval=5, limit=50, reset_history=False)
+            # Start automatic polling for new messages
+            self.bot.poll_for_new_messages(interval=interval, limit=50, reset_history=False)
                 
         except KeyboardInterrupt:
             print("\nProgram interrupted by user. Exiting.")
         except Exception as e:
             print(f"Error in main application: {e}")
+        finally:
+            # Let queued messages finish and their replies go out before exiting
+            self.worker_pool.shutdown(wait=True)
+            self.recipe_loader.shutdown(wait=True)
+            self.bot.outbound.close(timeout=30)
+            data_manager.flush()
 
 def run_flask_app():
     """Run Flask web app in a separate thread"""
@@ -429,6 +473,7 @@ if __name__ == "__main__":
     
     # Initialize the WhatsApp application
     app = WhatsAppFoodApp()
+    register_webhook_handler(app.bot.handle_webhook_event)
     
     # Start the WhatsApp application
     app.run()
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+class ConversationIndex:
+    """Persisted WhatsApp address -> conversation SID index
+
+    Lookups are answered from the index file. Misses are resolved with a single
+    ParticipantConversations query for the address and written back (lazy fill).
+    A full rebuild pages through all conversations of the service and lists the
+    participants of each page concurrently; it runs in a background thread.
+    """
+
+    def __init__(self, client, service_sid, path="data/conversation_index.json",
+                 scan_workers=8, page_size=50, max_age_seconds=24 * 3600):
+        self.client = client
+        self.service_sid = service_sid
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self.scan_workers = scan_workers
+        self.page_size = page_size
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._rebuild_thread = None
+        self._index = {}
+        self._built_at = 0
+        self._load()
+
+    def _service(self):
+        return self.client.conversations.v1.services(self.service_sid)
+
+    def _load(self):
+        """Load the index from disk"""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._index = data.get("addresses", {})
+            self._built_at = data.get("built_at", 0)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"⚠️ Could not load conversation index, starting empty: {e}")
+
+    def _save(self):
+        """Write the index atomically (lock must be held)"""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"built_at": self._built_at, "addresses": self._index}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, address):
+        """Return the indexed conversation SID for an address, without any API call"""
+        with self._lock:
+            return self._index.get(address)
+
+    def set(self, address, conversation_sid):
+        """Add or update an index entry"""
+        with self._lock:
+            if self._index.get(address) != conversation_sid:
+                self._index[address] = conversation_sid
+                self._save()
+
+    def remove(self, address):
+        """Drop a stale index entry"""
+        with self._lock:
+            if self._index.pop(address, None) is not None:
+                self._save()
+
+    def find(self, address):
+        """Return the conversation SID for an address, querying Twilio on an index miss"""
+        conversation_sid = self.lookup(address)
+        if conversation_sid:
+            return conversation_sid
+
+        try:
+            for conversation in self._service().participant_conversations.list(address=address, limit=20):
+                if conversation.conversation_state != 'closed':
+                    self.set(address, conversation.conversation_sid)
+                    return conversation.conversation_sid
+        except Exception as e:
+            print(f"Error looking up conversations for {address}: {e}")
+
+        return None
+
+    def conversations(self, prefix="whatsapp:"):
+        """Conversation SIDs of all indexed addresses starting with prefix (the bot's WhatsApp users)"""
+        with self._lock:
+            return {conversation_sid for address, conversation_sid in self._index.items() if address.startswith(prefix)}
+
+    def needs_rebuild(self):
+        """Check whether the index is missing or older than max_age_seconds"""
+        with self._lock:
+            return time.time() - self._built_at > self.max_age_seconds
+
+    def rebuild(self):
+        """Scan all conversations of the service and rebuild the index"""
+        print("🔄 Rebuilding conversation index...")
+        started = time.time()
+        index = {}
+
+        page = self._service().conversations.page(page_size=self.page_size)
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            while page is not None:
+                conversation_sids = [conv.sid for conv in page]
+                for conversation_sid, addresses in zip(conversation_sids, executor.map(self._participant_addresses, conversation_sids)):
+                    for address in addresses:
+                        # Keep the first (most recently listed) conversation per address
+                        index.setdefault(address, conversation_sid)
+                page = page.next_page()
+
+        with self._lock:
+            self._index = index
+            self._built_at = time.time()
+            self._save()
+
+        print(f"✅ Conversation index rebuilt: {len(index)} address(es) in {time.time() - started:.1f}s")
+        return index
+
+    def _participant_addresses(self, conversation_sid):
+        """List the messaging binding addresses of a conversation's participants"""
+        try:
+            participants = self._service().conversations(conversation_sid).participants.list()
+        except Exception as e:
+            print(f"Error listing participants of {conversation_sid}: {e}")
+            return []
+        return [
+            participant.messaging_binding.get('address')
+            for participant in participants
+            if getattr(participant, 'messaging_binding', None) and participant.messaging_binding.get('address')
+        ]
+
+    def rebuild_in_background(self):
+        """Start a rebuild in a daemon thread unless one is already running"""
+        if self._rebuild_thread and self._rebuild_thread.is_alive():
+            return self._rebuild_thread
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Error rebuilding conversation index: {e}")
+
+        self._rebuild_thread = threading.Thread(target=run, name="conversation-index", daemon=True)
+        self._rebuild_thread.start()
+        return self._rebuild_thread
+
+    def __len__(self):
+        return len(self._index)
@@ -1,36 +1,286 @@
-from flask import Flask, render_template, redirect, url_for
-import json
+from flask import Flask, render_template, redirect, url_for, request, abort, send_file
+from twilio.request_validator import RequestValidator
+from collections import OrderedDict
+from datetime import datetime, timezone
 import os
+import re
+import gzip
+import json
+import hmac
+import hashlib
+import threading
 from dotenv import load_dotenv
+from recipe import Recipe
+from storage import open_storage, recipe_key
+from saved_recipe_index import SavedRecipeIndexes, decode_cursor
+from thumbnails import ThumbnailCache, THUMBNAIL_WIDTHS, source_version
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# Saved recipes, same backend as the bot's DataManager (storage_backend)
+storage = open_storage()
+
+# Rendered pages per (user, variant), reused while the storage version is unchanged
+page_cache_enabled = os.environ.get("page_cache", "true").lower() == "true"
+PAGE_CACHE_SIZE = 256
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+# Per-user indexes behind /users/<phone>/recipes
+saved_indexes = SavedRecipeIndexes(storage)
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# Recipe image thumbnails served by /img/<recipe_id>
+thumbnails = ThumbnailCache(
+    quota_bytes=int(os.environ.get("thumbnail_cache_bytes", 100 * 1024 * 1024)),
+    workers=int(os.environ.get("thumbnail_workers", 2)),
+)
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+RECIPE_KEY_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+# Callback for verified Conversations webhook events, registered by app.py
+webhook_handler = None
+
+def register_webhook_handler(handler):
+    """Register the function that receives verified webhook events"""
+    global webhook_handler
+    webhook_handler = handler
+
+def is_valid_twilio_request():
+    """Check the X-Twilio-Signature header against the configured auth token"""
+    auth_token = os.environ.get("twilio_auth_token")
+    if not auth_token:
+        print("⚠️ twilio_auth_token is not set, rejecting webhook request")
+        return False
+
+    # Behind a tunnel or proxy the public URL differs from the one Flask sees
+    url = os.environ.get("webhook_public_url") or request.url
+    signature = request.headers.get("X-Twilio-Signature", "")
+    return RequestValidator(auth_token).validate(url, request.form.to_dict(), signature)
+
+def may_read_recipes(phone_number):
+    """Whether this request may read a user's saved recipes
+
+    The app also serves the public webhook, so only the configured user's
+    recipes are open; other users need the recipes_api_token as a Bearer
+    token.
+    """
+    if phone_number == os.environ.get("your_whatsapp"):
+        return True
+    token = os.environ.get("recipes_api_token")
+    authorization = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
 def load_recipes():
     """Load the recipes data for the current user"""
     try:
-        with open("data/data.json", "r") as f:
-            data = json.load(f)
-        
         # Get the current user from environment variables
         current_user = os.environ.get("your_whatsapp")
-        
-        # Check if user exists in data
-        if current_user in data["users"]:
-            return data["users"][current_user]["saved_recipes"]
-        else:
-            return []
+        return [Recipe.from_dict(recipe) for recipe in storage.saved_recipes(current_user)]
     except Exception as e:
         print(f"Error loading recipes: {e}")
         return []
 
+class CachedPage:
+    """A rendered response body with its gzip variant and validators"""
+
+    __slots__ = ("version", "body", "gzipped", "etag", "last_modified", "mimetype")
+
+    def __init__(self, version, body, mimetype, modified_at):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        # Strong ETag: a hash of the exact bytes
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = datetime.fromtimestamp(int(modified_at), timezone.utc)
+        self.mimetype = mimetype
+
+def _render_page(variant):
+    """Render the current user's recipes page (HTML) or full list (JSON) as bytes"""
+    current_user = os.environ.get("your_whatsapp")
+    if variant == "json":
+        recipes = [recipe.to_dict() for recipe in load_recipes()]
+        return json.dumps(recipes, ensure_ascii=False).encode("utf-8"), "application/json"
+    return render_template("index.html", current_user=current_user).encode("utf-8"), "text/html"
+
+def cached_page_response(key, render):
+    """Serve a page from the render cache with ETag/Last-Modified, 304s and gzip
+
+    render() returns (body bytes, mimetype). The cache entry for key is valid
+    while storage.version() is unchanged, so a conditional request for
+    unchanged data neither reads the recipes nor renders anything.
+    """
+    if not page_cache_enabled:
+        body, mimetype = render()
+        return app.response_class(body, mimetype=mimetype)
+
+    version, modified_at = storage.version()
+    with _page_cache_lock:
+        page = _page_cache.get(key)
+        if page is not None and page.version == version:
+            _page_cache.move_to_end(key)
+        else:
+            page = None
+
+    if page is None:
+        body, mimetype = render()
+        page = CachedPage(version, body, mimetype, modified_at)
+        with _page_cache_lock:
+            _page_cache[key] = page
+            _page_cache.move_to_end(key)
+            while len(_page_cache) > PAGE_CACHE_SIZE:
+                _page_cache.popitem(last=False)
+
+    use_gzip = request.accept_encodings["gzip"] > 0
+    response = app.response_class(page.gzipped if use_gzip else page.body, mimetype=page.mimetype)
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    # Each encoding is a different representation and needs its own strong ETag
+    response.set_etag(page.etag + ("-gzip" if use_gzip else ""))
+    response.last_modified = page.last_modified
+    # Browsers may keep the page but must revalidate, which is a cheap 304
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+def _optional_number(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        abort(400, f"{name} must be a number")
+
+def _optional_date(name):
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f"{name} must be an ISO date or datetime")
+    return value
+
+def _render_recipe_page(phone_number, query):
+    """One page of a user's saved recipes as JSON bytes"""
+    result = saved_indexes.get(phone_number).page(**query)
+    # Cards only need the summary, the instructions stay on the recipe page
+    result["recipes"] = [_card(recipe) for recipe in result["recipes"]]
+    return json.dumps(result, ensure_ascii=False).encode("utf-8"), "application/json"
+
+def _card(stored):
+    """Summary of a saved recipe for a card, with the URL of its thumbnail"""
+    card = Recipe.from_dict(stored).to_dict(include_details=False)
+    if card["bild_url"]:
+        # The source version in the URL lets browsers cache a thumbnail for good and still see a new image
+        card["thumbnail_url"] = url_for("recipe_image", recipe_id=recipe_key(stored), v=source_version(card["bild_url"]))
+    return card
+
 @app.route("/")
 def index():
     """Main page with list of recipes"""
-    recipes = load_recipes()
-    return render_template("index.html", all_found_recipes=recipes)
+    return cached_page_response((os.environ.get("your_whatsapp"), "html"), lambda: _render_page("html"))
+
+@app.route("/recipes.json")
+def recipes_json():
+    """The current user's saved recipes as JSON"""
+    return cached_page_response((os.environ.get("your_whatsapp"), "json"), lambda: _render_page("json"))
+
+@app.route("/users/<phone>/recipes")
+def user_recipes(phone):
+    """A page of a user's saved recipes, newest first
+
+    Query parameters: limit (1-100, default 24), cursor (next_cursor of the
+    previous page), min_health/max_health, ingredient (repeatable, all must
+    match), saved_after (inclusive) and saved_before (exclusive). Other
+    users than your_whatsapp need a token, see may_read_recipes().
+    """
+    phone_number = phone if phone.startswith("whatsapp:") else f"whatsapp:{phone}"
+    if not may_read_recipes(phone_number):
+        # Same answer as for an unknown user, so numbers can't be probed
+        abort(404)
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        abort(400, "limit must be an integer")
+    query = {
+        "limit": max(1, min(limit, MAX_PAGE_SIZE)),
+        "cursor": request.args.get("cursor") or None,
+        "min_health": _optional_number("min_health"),
+        "max_health": _optional_number("max_health"),
+        "ingredients": tuple(value for value in request.args.getlist("ingredient") if value.strip()),
+        "saved_after": _optional_date("saved_after"),
+        "saved_before": _optional_date("saved_before"),
+    }
+    if query["cursor"]:
+        try:
+            decode_cursor(query["cursor"])
+        except ValueError:
+            abort(400, "invalid cursor")
+
+    key = (phone_number, "page", tuple(sorted(query.items())))
+    return cached_page_response(key, lambda: _render_recipe_page(phone_number, query))
+
+@app.route("/img/<recipe_id>")
+def recipe_image(recipe_id):
+    """WebP thumbnail of a saved recipe's image, ?w= one of THUMBNAIL_WIDTHS
+
+    Only images of stored recipes are proxied. ?v= is the source_version()
+    of the image URL; such URLs are cached for a year, a stale v redirects
+    to the current one. While a thumbnail cannot be made the browser is
+    sent to the original image instead.
+    """
+    if not RECIPE_KEY_PATTERN.fullmatch(recipe_id):
+        abort(404)
+    recipe = storage.get_recipe(recipe_id)
+    if not recipe or not recipe.get("bild_url"):
+        abort(404)
+    try:
+        width = int(request.args.get("w", THUMBNAIL_WIDTHS[0]))
+    except ValueError:
+        abort(400, "w must be an integer")
+    if width not in THUMBNAIL_WIDTHS:
+        abort(400, f"w must be one of {', '.join(map(str, THUMBNAIL_WIDTHS))}")
+
+    version = source_version(recipe["bild_url"])
+    requested = request.args.get("v")
+    if requested and requested != version:
+        # The recipe's image changed since the card was rendered
+        return redirect(url_for("recipe_image", recipe_id=recipe_id, v=version, w=width))
+
+    path = thumbnails.get(recipe_id, recipe["bild_url"], width)
+    if path is None:
+        response = redirect(recipe["bild_url"])
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    # Only a versioned URL always means the same image; without v browsers revalidate (ETag)
+    response = send_file(path, mimetype="image/webp", max_age=THUMBNAIL_MAX_AGE if requested else 0, conditional=True)
+    if requested:
+        response.cache_control.public = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@app.route("/whatsapp/webhook", methods=["POST"])
+def whatsapp_webhook():
+    """Receive Conversations onMessageAdded events from Twilio"""
+    if not is_valid_twilio_request():
+        abort(403)
+
+    if webhook_handler is None:
+        # Bot not started yet, Twilio retries and the reconciliation poll catches up
+        abort(503)
+
+    # The handler only enqueues onto the bot's worker pool, so calling it inline keeps
+    # the event order. A full queue blocks here and Twilio retries (backpressure).
+    webhook_handler(request.form.to_dict())
+    return "", 200
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds, so a hung socket can't block a worker forever
+DEFAULT_TIMEOUT = (3.05, 20)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without a network call while a host's circuit breaker is open"""
+
+
+class _HostState:
+    """Pooled session, circuit breaker and counters of one host"""
+
+    def __init__(self, pool_size):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False  # half-open: one request is testing the host, the others are rejected
+        self.stats = {"requests": 0, "errors": 0, "retries": 0, "rejected": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+
+class HttpClient:
+    """Shared transport for all outbound HTTP calls
+
+    - one keep-alive session (connection pool) per host
+    - connect/read timeouts on every request
+    - retries with jittered exponential backoff on connection errors and
+      429/5xx responses, honouring Retry-After
+    - a per-host circuit breaker: after failure_threshold consecutive failures
+      the host is skipped for reset_seconds, then a single trial request decides
+    - per-host latency and error counters, see host_stats()
+    """
+
+    def __init__(self, max_retries=3, backoff_base=0.5, max_backoff=30.0,
+                 failure_threshold=5, reset_seconds=30.0, pool_size=10):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.pool_size = pool_size
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.pool_size)
+            return host, state
+
+    def request(self, method, url, retries=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """Send a request through the pooled session of the URL's host
+
+        Returns the final response (which may still be a 429/5xx after all
+        retries) or raises requests.RequestException / CircuitOpenError.
+        """
+        host, state = self._host(url)
+        retries = self.max_retries if retries is None else retries
+
+        for attempt in range(retries + 1):
+            trial = self._check_circuit(host, state)
+
+            started = time.perf_counter()
+            try:
+                response = state.session.request(method, url, timeout=timeout, **kwargs)
+            except requests.RequestException:
+                self._record(state, time.perf_counter() - started, failed=True, trial=trial)
+                if attempt >= retries:
+                    raise
+                self._sleep_before_retry(state, attempt)
+                continue
+            except Exception:
+                # Not the host's fault (e.g. a bad URL), let the next request be the trial instead
+                if trial:
+                    with state.lock:
+                        state.trial_in_flight = False
+                raise
+
+            failed = response.status_code >= 500
+            self._record(state, time.perf_counter() - started, failed=failed, trial=trial)
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+
+            retry_after = self._retry_after(response)
+            response.close()
+            self._sleep_before_retry(state, attempt, retry_after)
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        # Not retried by default, POSTs are not idempotent
+        kwargs.setdefault("retries", 0)
+        return self.request("POST", url, **kwargs)
+
+    def _check_circuit(self, host, state):
+        """Raise CircuitOpenError while the breaker is open, returns True for the single half-open trial"""
+        with state.lock:
+            if state.opened_at is None:
+                return False
+            if time.monotonic() - state.opened_at >= self.reset_seconds and not state.trial_in_flight:
+                # Half-open: only this request goes through until it has returned
+                state.trial_in_flight = True
+                return True
+            state.stats["rejected"] += 1
+        raise CircuitOpenError(f"Circuit open for {host}, skipping request")
+
+    def _record(self, state, seconds, failed, trial=False):
+        with state.lock:
+            state.stats["requests"] += 1
+            state.stats["total_seconds"] += seconds
+            state.stats["max_seconds"] = max(state.stats["max_seconds"], seconds)
+            if failed:
+                state.stats["errors"] += 1
+                state.consecutive_failures += 1
+            else:
+                state.consecutive_failures = 0
+
+            if trial:
+                # The trial decides: closed again on success, another reset_seconds open on failure
+                state.trial_in_flight = False
+                state.opened_at = time.monotonic() if failed else None
+                print("⚠️ Circuit re-opened, trial request failed" if failed else "✅ Circuit closed, trial request succeeded")
+            elif failed and state.consecutive_failures >= self.failure_threshold and state.opened_at is None:
+                state.opened_at = time.monotonic()
+                print(f"⚠️ Circuit opened after {state.consecutive_failures} consecutive failures")
+
+    def _retry_after(self, response):
+        """Seconds to wait according to a Retry-After header, or None"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _sleep_before_retry(self, state, attempt, retry_after=None):
+        with state.lock:
+            state.stats["retries"] += 1
+        if retry_after is not None:
+            delay = min(retry_after, self.max_backoff)
+        else:
+            # Full jitter keeps many workers from retrying in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.backoff_base * 2 ** attempt))
+        time.sleep(delay)
+
+    def host_stats(self):
+        """Return latency, error and circuit state per host"""
+        with self._hosts_lock:
+            hosts = dict(self._hosts)
+
+        report = {}
+        for host, state in hosts.items():
+            with state.lock:
+                stats = dict(state.stats)
+                stats["avg_seconds"] = stats["total_seconds"] / stats["requests"] if stats["requests"] else 0.0
+                stats["circuit_open"] = state.opened_at is not None
+                report[host] = stats
+        return report
+
+
+# Process-wide instance used by api_spoon, data_manager and the web app
+http = HttpClient()
+
+
+def get(url, **kwargs):
+    return http.get(url, **kwargs)
+
+
+def host_stats():
+    return http.host_stats()
@@ -0,0 +1,118 @@
+import io
+import os
+import time
+import base64
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Bytes per base64 chunk, a multiple of 3 so chunks concatenate without padding
+_BASE64_CHUNK = 3 * 64 * 1024
+
+# File signatures of the formats the vision API accepts, for input Pillow cannot decode
+_SIGNATURES = ((b"\xff\xd8\xff", "image/jpeg"), (b"\x89PNG\r\n\x1a\n", "image/png"), (b"GIF87a", "image/gif"), (b"GIF89a", "image/gif"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+stats = {"images": 0, "original_bytes": 0, "encoded_bytes": 0, "seconds": 0.0}
+
+
+class UnsupportedImageError(ValueError):
+    """Raised for input that is neither decodable nor in a format the vision API accepts"""
+
+
+def sniff_mime(data):
+    """MIME type of a JPEG, PNG, GIF or WebP file by its signature, or None"""
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def encode_base64_chunked(data):
+    """Base64-encode data chunk by chunk instead of copying it into one big intermediate"""
+    view = memoryview(data)
+    return "".join(
+        base64.b64encode(view[start:start + _BASE64_CHUNK]).decode("ascii")
+        for start in range(0, len(view), _BASE64_CHUNK)
+    )
+
+
+def preprocess_image(image_bytes, max_edge=1024, image_format="JPEG", quality=80):
+    """Detect the format, fix EXIF orientation, downscale and re-encode an image for upload
+
+    Returns a dict with the MIME type and base64 payload plus size and timing
+    figures. Files Pillow cannot read are passed through unchanged with their
+    sniffed type, or rejected with UnsupportedImageError if it is unknown.
+    """
+    started = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            source_format = image.format
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            if image_format.upper() == "JPEG" and image.mode != "RGB":
+                # JPEG has no alpha channel, flatten transparent PNGs onto white
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                rgba = image.convert("RGBA")
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                image = background
+
+            output = io.BytesIO()
+            image.save(output, format=image_format, quality=quality, optimize=True)
+            encoded = output.getbuffer()
+            mime = f"image/{image_format.lower()}"
+    except Exception:
+        # Not decodable by Pillow: upload the original bytes if their real type is one the API accepts
+        mime = sniff_mime(image_bytes)
+        if mime is None:
+            raise UnsupportedImageError("image format not recognized, expected JPEG, PNG, GIF or WebP")
+        source_format = None
+        encoded = image_bytes
+
+    return {
+        "mime": mime,
+        "base64": encode_base64_chunked(encoded),
+        "source_format": source_format,
+        "original_bytes": len(image_bytes),
+        "encoded_bytes": len(encoded),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _get_pool():
+    """Process pool shared by all callers, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Not fork: the pool starts from a message worker while Flask, sender and timer threads run,
+            # and a forked child can deadlock on locks those threads held. Workers import the main
+            # module like with spawn (app.py starts the bot only under its __main__ guard); the
+            # forkserver preloads this module and Pillow so they start quickly.
+            context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+            if context.get_start_method() == "forkserver":
+                context.set_forkserver_preload([__name__])
+            _pool = ProcessPoolExecutor(max_workers=int(os.getenv("image_workers", 2)), mp_context=context)
+        return _pool
+
+
+def preprocess_in_pool(image_bytes, max_edge=1024, image_format="JPEG", quality=80):
+    """Run preprocess_image in the process pool so it doesn't hold the GIL of the message workers"""
+    result = _get_pool().submit(preprocess_image, image_bytes, max_edge, image_format, quality).result()
+
+    with _stats_lock:
+        stats["images"] += 1
+        stats["original_bytes"] += result["original_bytes"]
+        stats["encoded_bytes"] += result["encoded_bytes"]
+        stats["seconds"] += result["seconds"]
+
+    saved = result["original_bytes"] - result["encoded_bytes"]
+    print(f"🖼️ {result['source_format'] or 'unknown'} image: {result['original_bytes']} -> {result['encoded_bytes']} bytes "
+          f"({saved} saved) in {result['seconds'] * 1000:.0f} ms")
+    return result
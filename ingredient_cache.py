@@ -0,0 +1,158 @@
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+
+def perceptual_hash(image_bytes):
+    """64-bit difference hash (dHash) of an image, robust to re-encoding and resizing"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+class IngredientCache:
+    """On-disk cache of ingredient lists extracted from images
+
+    Entries are keyed by the SHA-256 of the image bytes, so the same photo sent
+    again or forwarded is answered without calling OpenAI. With perceptual=True
+    a miss falls back to the closest entry by dHash (Hamming distance up to
+    max_distance), which also catches re-compressed or resized copies.
+    Total size on disk is capped at max_bytes, least recently used entries are
+    evicted first.
+    """
+
+    def __init__(self, cache_dir="data/ingredient_cache", max_bytes=20 * 1024 * 1024, perceptual=False, max_distance=6):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+
+        self._lock = threading.Lock()
+        self._entries = {}  # content hash -> {"size", "last_used", "dhash"}
+        self.stats = {"hits": 0, "perceptual_hits": 0, "misses": 0, "saved_seconds": 0.0, "saved_tokens": 0}
+        self._load_index()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def _load_index(self):
+        """Build the in-memory index from the cache directory"""
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            self._entries[path.stem] = {"size": stat.st_size, "last_used": stat.st_mtime, "dhash": entry.get("dhash")}
+
+    def get(self, image_bytes):
+        """Return the cached ingredient list for an image, or None"""
+        key = hashlib.sha256(image_bytes).hexdigest()
+        with self._lock:
+            entry = self._read(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return self._served(entry)
+
+        if self.perceptual:
+            # Decoding the photo is the slow part, so it runs without holding the cache lock
+            try:
+                target = perceptual_hash(image_bytes)
+            except Exception:
+                target = None
+            if target is not None:
+                with self._lock:
+                    entry = self._read_similar(target)
+                    if entry is not None:
+                        self.stats["perceptual_hits"] += 1
+                        return self._served(entry)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def _served(self, entry):
+        """Count what a cache hit saved and return its ingredients (lock must be held)"""
+        self.stats["saved_seconds"] += entry.get("latency", 0.0)
+        self.stats["saved_tokens"] += entry.get("tokens", 0)
+        return entry["ingredients"]
+
+    def _read(self, key):
+        """Load an entry from disk and mark it as recently used (lock must be held)"""
+        if key not in self._entries:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            self._entries.pop(key, None)
+            return None
+        self._entries[key]["last_used"] = time.time()
+        os.utime(path)
+        return entry
+
+    def _read_similar(self, target):
+        """Find the closest entry to the perceptual hash target (lock must be held)"""
+        best_key, best_distance = None, self.max_distance + 1
+        for key, info in self._entries.items():
+            if info.get("dhash") is None:
+                continue
+            distance = bin(target ^ info["dhash"]).count("1")
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return self._read(best_key) if best_key else None
+
+    def put(self, image_bytes, ingredients, latency=0.0, tokens=0):
+        """Store the ingredient list extracted for an image"""
+        key = hashlib.sha256(image_bytes).hexdigest()
+        dhash = None
+        if self.perceptual:
+            try:
+                dhash = perceptual_hash(image_bytes)
+            except Exception:
+                pass
+
+        entry = {"ingredients": ingredients, "latency": latency, "tokens": tokens, "dhash": dhash, "created_at": time.time()}
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._entries[key] = {"size": path.stat().st_size, "last_used": time.time(), "dhash": dhash}
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits max_bytes (lock must be held)"""
+        total = sum(info["size"] for info in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            total -= self._entries.pop(key)["size"]
+            self._path(key).unlink(missing_ok=True)
+            if total <= self.max_bytes:
+                break
+
+    def report(self):
+        """Return hit rate, saved latency and saved tokens"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["perceptual_hits"] + self.stats["misses"]
+            hits = self.stats["hits"] + self.stats["perceptual_hits"]
+            return dict(self.stats, entries=len(self._entries), hit_rate=hits / lookups if lookups else 0.0)
@@ -0,0 +1,268 @@
+import re
+import threading
+from functools import lru_cache
+
+# Canonical English ingredient names as Spoonacular expects them
+INGREDIENTS = [
+    "apple", "apricot", "artichoke", "arugula", "asparagus", "avocado", "bacon", "banana", "basil", "bay leaf",
+    "bean", "beef", "beet", "bell pepper", "black bean", "blueberry", "bread", "broccoli", "brussels sprout",
+    "butter", "buttermilk", "cabbage", "carrot", "cashew", "cauliflower", "celery", "cheddar", "cheese",
+    "cherry", "chicken", "chicken breast", "chickpea", "chili", "chive", "chocolate", "cilantro", "cinnamon",
+    "coconut", "coconut milk", "cod", "corn", "couscous", "cranberry", "cream", "cream cheese", "cucumber",
+    "cumin", "curry", "dill", "duck", "egg", "eggplant", "feta", "fish", "flour", "garlic", "ginger",
+    "gouda", "grape", "green bean", "ground beef", "ham", "honey", "ice cream", "kale", "ketchup", "kidney bean", "kiwi",
+    "lamb", "leek", "lemon", "lentil", "lettuce", "lime", "mango", "maple syrup", "mayonnaise", "milk",
+    "mint", "mozzarella", "mushroom", "mustard", "noodle", "nutmeg", "oat", "olive", "olive oil", "onion",
+    "orange", "oregano", "parmesan", "parsley", "pasta", "pea", "peach", "peanut",
+    "peanut butter", "pear", "pepper", "pineapple", "pistachio", "plum", "pork", "potato", "prawn",
+    "pumpkin", "quinoa", "radish", "raspberry", "red onion", "rice", "ricotta", "rosemary", "salami",
+    "salmon", "salt", "sausage", "scallion", "shrimp", "sour cream", "soy sauce", "spaghetti", "spinach",
+    "spring onion", "squash", "strawberry", "sugar", "sweet potato", "thyme", "tofu", "tomato",
+    "tomato paste", "tortilla", "tuna", "turkey", "vanilla", "vinegar", "walnut", "watermelon", "wine",
+    "yogurt", "zucchini",
+]
+
+# German spellings mapped to the canonical names
+SYNONYMS = {
+    "apfel": "apple", "äpfel": "apple", "aprikose": "apricot", "rucola": "arugula", "spargel": "asparagus",
+    "speck": "bacon", "banane": "banana", "basilikum": "basil", "lorbeerblatt": "bay leaf", "bohne": "bean",
+    "rindfleisch": "beef", "rind": "beef", "rote bete": "beet", "paprika": "bell pepper",
+    "paprikaschote": "bell pepper", "heidelbeere": "blueberry", "blaubeere": "blueberry", "brot": "bread",
+    "brokkoli": "broccoli", "rosenkohl": "brussels sprout", "kohl": "cabbage", "weißkohl": "cabbage",
+    "karotte": "carrot", "möhre": "carrot", "mohrrübe": "carrot", "blumenkohl": "cauliflower",
+    "sellerie": "celery", "käse": "cheese", "kirsche": "cherry", "hähnchen": "chicken", "huhn": "chicken",
+    "hühnchen": "chicken", "hähnchenbrust": "chicken breast", "hühnerbrust": "chicken breast",
+    "kichererbse": "chickpea", "schnittlauch": "chive", "schokolade": "chocolate", "koriander": "cilantro",
+    "zimt": "cinnamon", "kokosmilch": "coconut milk", "kabeljau": "cod", "mais": "corn",
+    "sahne": "cream", "frischkäse": "cream cheese", "gurke": "cucumber", "kreuzkümmel": "cumin",
+    "ente": "duck", "ei": "egg", "aubergine": "eggplant", "fisch": "fish", "mehl": "flour",
+    "knoblauch": "garlic", "ingwer": "ginger", "traube": "grape", "weintraube": "grape",
+    "grüne bohne": "green bean", "hackfleisch": "ground beef", "rinderhack": "ground beef",
+    "schinken": "ham", "honig": "honey", "grünkohl": "kale", "kidneybohne": "kidney bean",
+    "lamm": "lamb", "lauch": "leek", "porree": "leek", "zitrone": "lemon", "linse": "lentil",
+    "kopfsalat": "lettuce", "salat": "lettuce", "limette": "lime", "ahornsirup": "maple syrup",
+    "mayo": "mayonnaise", "milch": "milk", "minze": "mint", "pilz": "mushroom", "champignon": "mushroom",
+    "senf": "mustard", "nudel": "noodle", "muskat": "nutmeg", "muskatnuss": "nutmeg", "hafer": "oat",
+    "haferflocken": "oat", "olive": "olive", "olivenöl": "olive oil", "zwiebel": "onion",
+    "orange": "orange", "apfelsine": "orange", "petersilie": "parsley", "nudeln": "pasta",
+    "erbse": "pea", "pfirsich": "peach", "erdnuss": "peanut", "erdnussbutter": "peanut butter",
+    "birne": "pear", "pfeffer": "pepper", "ananas": "pineapple", "pflaume": "plum",
+    "schweinefleisch": "pork", "schwein": "pork", "kartoffel": "potato", "garnele": "prawn",
+    "kürbis": "pumpkin", "radieschen": "radish", "himbeere": "raspberry", "rote zwiebel": "red onion",
+    "eis": "ice cream", "speiseeis": "ice cream", "reis": "rice", "rosmarin": "rosemary", "lachs": "salmon", "salz": "salt", "wurst": "sausage",
+    "würstchen": "sausage", "krabbe": "shrimp", "sojasoße": "soy sauce", "sojasauce": "soy sauce",
+    "spinat": "spinach", "frühlingszwiebel": "spring onion", "erdbeere": "strawberry", "zucker": "sugar",
+    "süßkartoffel": "sweet potato", "thymian": "thyme", "tomate": "tomato", "tomatenmark": "tomato paste",
+    "thunfisch": "tuna", "pute": "turkey", "truthahn": "turkey", "vanille": "vanilla", "essig": "vinegar",
+    "walnuss": "walnut", "wassermelone": "watermelon", "wein": "wine", "joghurt": "yogurt",
+    "jogurt": "yogurt", "zucchini": "zucchini",
+}
+
+# Common English variant spellings mapped to the canonical names
+ENGLISH_SYNONYMS = {
+    "aubergines": "eggplant", "courgette": "zucchini", "minced beef": "ground beef", "mince": "ground beef",
+    "green onion": "scallion", "garbanzo": "chickpea", "yoghurt": "yogurt", "prawns": "prawn",
+    "capsicum": "bell pepper", "coriander": "cilantro", "rocket": "arugula",
+}
+
+# Words that carry no ingredient information ("2 fresh tomatoes", "etwas frische Petersilie")
+STOPWORDS = {
+    "a", "an", "some", "fresh", "frozen", "dried", "chopped", "sliced", "large", "small", "big", "of", "the",
+    "g", "kg", "ml", "l", "cup", "cups", "tbsp", "tsp", "pcs", "piece", "pieces", "can", "cans", "pack",
+    "ein", "eine", "einen", "etwas", "frisch", "frische", "frischer", "frischen", "gefroren", "gefrorene",
+    "getrocknet", "getrocknete", "stück", "dose", "dosen", "packung", "bund", "prise", "el", "tl", "gramm",
+    "halbe", "halber", "viel", "wenig", "paar", "i", "have", "got", "ich", "habe", "noch",
+}
+
+# Singular words that end like a plural and must not be folded ("Eis" is not "Ei")
+NOT_PLURAL = {"eis", "reis", "mais", "ananas", "asparagus", "couscous", "hummus", "swiss"}
+
+# Plural suffixes per language: (suffix, replacement, minimum length of the remaining stem, letters the
+# stem may end in or None for any). A fold only counts if it yields a spelling of the same language.
+ENGLISH_PLURALS = (
+    ("ies", "y", 3, None),  # cherries
+    ("oes", "o", 3, None),  # tomatoes
+    ("es", "", 3, "hsxz"),  # peaches, radishes
+    ("s", "", 3, "abcdefghijklmnopqrtvwxyz"),  # onions, but not "hummus" or "swiss"
+)
+GERMAN_PLURALS = (
+    ("n", "", 3, "elr"),  # Tomaten, Zwiebeln
+    ("en", "", 3, None),  # Pilzen
+    ("e", "", 3, None),  # Pilze
+    ("er", "", 2, None),  # Eier
+    ("s", "", 4, None),  # Champignons
+)
+
+# Separators between list items
+SPLIT_PATTERN = re.compile(r",|;|\n|\band\b|\bund\b|&|\+", re.IGNORECASE)
+
+
+class _TrieNode:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+
+
+class IngredientTrie:
+    """Trie over known spellings with bounded edit-distance search"""
+
+    def __init__(self, mapping):
+        self.root = _TrieNode()
+        for key, value in mapping.items():
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+            node.value = value
+
+    def get(self, word):
+        node = self.root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node.value
+
+    def fuzzy(self, word, max_distance):
+        """Return the value of the closest key within max_distance edits, or None
+
+        Walks the trie computing one Levenshtein row per node, pruning branches
+        whose row minimum already exceeds max_distance.
+        """
+        best = [max_distance + 1, None]
+        first_row = list(range(len(word) + 1))
+        for char, child in self.root.children.items():
+            self._fuzzy(child, char, word, first_row, max_distance, best)
+        return best[1]
+
+    def _fuzzy(self, node, char, word, previous_row, max_distance, best):
+        row = [previous_row[0] + 1]
+        for column in range(1, len(word) + 1):
+            row.append(min(
+                row[column - 1] + 1,
+                previous_row[column] + 1,
+                previous_row[column - 1] + (word[column - 1] != char),
+            ))
+
+        if node.value is not None and row[-1] < best[0]:
+            best[0], best[1] = row[-1], node.value
+
+        if min(row) <= max_distance:
+            for next_char, child in node.children.items():
+                self._fuzzy(child, next_char, word, row, max_distance, best)
+
+
+def _singular_candidates(word):
+    """Possible singular forms of a word as (candidate, language), the word itself first with language None"""
+    candidates = [(word, None)]
+    if word in NOT_PLURAL:
+        return candidates
+    for language, rules in (("en", ENGLISH_PLURALS), ("de", GERMAN_PLURALS)):
+        for suffix, replacement, min_stem, stem_endings in rules:
+            stem = word[:-len(suffix)]
+            if (word.endswith(suffix) and len(stem) >= min_stem
+                    and (stem_endings is None or stem[-1] in stem_endings)):
+                candidates.append((stem + replacement, language))
+    return candidates
+
+
+class IngredientNormalizer:
+    """Maps free-text ingredient lists to canonical English names without a network call
+
+    Items are matched exactly against the lexicon and German synonyms, then
+    after plural folding (an English plural suffix only counts if it yields
+    an English spelling and a German one a German spelling, so "Eis" isn't
+    "Ei" and "corner" isn't "corn"), then after correcting typos word by word (small edit
+    distance against the words of the lexicon). A descriptive prefix is
+    dropped only if at least two trailing words still match ("diced red
+    onions"); a single trailing word is often a different ingredient
+    ("brown sugar", "hot sauce"). Items that still don't match are returned
+    as unknown for the caller to resolve remotely.
+    """
+
+    def __init__(self, ingredients=INGREDIENTS, synonyms=SYNONYMS, english_synonyms=ENGLISH_SYNONYMS):
+        mapping = {name: name for name in ingredients}
+        mapping.update(english_synonyms)
+        mapping.update(synonyms)
+        self.trie = IngredientTrie(mapping)
+        # Spellings per language, plural folding only matches within one
+        self.spellings = {"en": set(ingredients) | set(english_synonyms), "de": set(synonyms)}
+        self.word_trie = IngredientTrie({word: word for name in mapping for word in name.split()})
+
+        self._lock = threading.Lock()
+        self.stats = {"messages": 0, "local_only": 0, "remote": 0}
+        # Memoized per instance, items repeat a lot between messages
+        self.normalize_item = lru_cache(maxsize=4096)(self._normalize_item)
+
+    def _normalize_item(self, item):
+        """Canonical name for a single list item, or None if unknown"""
+        words = [w for w in re.findall(r"[a-zäöüß]+", item.lower()) if w not in STOPWORDS]
+        if not words:
+            return None
+
+        match = self._match_words(words)
+        if match:
+            return match
+
+        # Typos: correct each word on its own, then the corrected phrase must match as a whole
+        corrected = [self._correct_word(word) for word in words]
+        return self._match_words(corrected) if corrected != words else None
+
+    def _match_words(self, words):
+        """Match the whole phrase, or drop leading words as long as two or more remain"""
+        for start in range(max(1, len(words) - 1)):
+            match = self._lookup(" ".join(words[start:]))
+            if match:
+                return match
+        return None
+
+    def _correct_word(self, word):
+        """Closest word of the lexicon for a misspelled word: one edit for short words, two for longer ones"""
+        if len(word) < 5 or any(self.word_trie.get(candidate) for candidate, _ in _singular_candidates(word)):
+            return word
+        return self.word_trie.fuzzy(word, 1 if len(word) <= 6 else 2) or word
+
+    def _lookup(self, phrase):
+        """Exact match after plural folding of the last word"""
+        head, _, last = phrase.rpartition(" ")
+        for candidate, language in _singular_candidates(last):
+            key = f"{head} {candidate}" if head else candidate
+            if language is not None and key not in self.spellings[language]:
+                continue
+            match = self.trie.get(key)
+            if match:
+                return match
+        return None
+
+    def split(self, text):
+        """Split a message or list into individual items"""
+        if isinstance(text, str):
+            items = SPLIT_PATTERN.split(text)
+        else:
+            items = [part for entry in text for part in SPLIT_PATTERN.split(entry)]
+        return [item.strip() for item in items if item and item.strip()]
+
+    def normalize(self, text):
+        """Return (known canonical names, unknown items) for a message or list"""
+        known, unknown = [], []
+        for item in self.split(text):
+            match = self.normalize_item(item)
+            if match:
+                if match not in known:
+                    known.append(match)
+            else:
+                unknown.append(item)
+        return known, unknown
+
+    def record(self, needed_remote):
+        """Count a processed message and whether it needed the remote call"""
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["remote" if needed_remote else "local_only"] += 1
+
+    def report(self):
+        """Return message counts and the fraction that needed the remote call"""
+        with self._lock:
+            messages = self.stats["messages"]
+            return dict(self.stats, remote_fraction=self.stats["remote"] / messages if messages else 0.0)
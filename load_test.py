@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import json
+import logging
+import argparse
+import tempfile
+import subprocess
+import threading
+from datetime import datetime
+
+import requests
+
+# Small load test for the saved-recipes page.
+#
+#   python load_test.py                      -> start the web app on synthetic data, compare uncached vs cached
+#   python load_test.py --url http://localhost:3007/ --requests 5000
+
+
+def run_scenario(url, total, concurrency, headers=None):
+    """Send total GETs from concurrency threads, return (requests per second, status counts)"""
+    counter = {"left": total}
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if counter["left"] <= 0:
+                    return
+                counter["left"] -= 1
+            response = session.get(url, headers=headers or {})
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return total / (time.perf_counter() - started), statuses
+
+
+def run_all(url, total, concurrency):
+    plain = run_scenario(url, total, concurrency, {"Accept-Encoding": "identity"})
+    gzipped = run_scenario(url, total, concurrency, {"Accept-Encoding": "gzip"})
+
+    first = requests.get(url, headers={"Accept-Encoding": "gzip"})
+    conditional = None
+    if first.headers.get("ETag"):
+        conditional = run_scenario(url, total, concurrency, {"Accept-Encoding": "gzip", "If-None-Match": first.headers["ETag"]})
+
+    print(f"  GET                       {plain[0]:8.0f} req/s  {plain[1]}")
+    print(f"  GET gzip                  {gzipped[0]:8.0f} req/s  {gzipped[1]}  ({len(first.content)} -> {first.headers.get('Content-Length')} bytes)")
+    if conditional:
+        print(f"  GET If-None-Match         {conditional[0]:8.0f} req/s  {conditional[1]}")
+
+
+def synthetic_data(user, count):
+    recipes, saved = {}, []
+    for n in range(count):
+        recipes[str(n)] = {
+            "id": n, "rezeptname": f"Recipe {n}", "bild_url": f"https://img.spoonacular.com/recipes/{n}-556x370.jpg",
+            "gesundheitsbewertung": n % 100, "rezept_url": f"https://example.com/recipes/{n}", "video_url": "",
+            "zubereitung": [f"Step {step} of recipe {n}." for step in range(8)],
+            "zutaten": [f"1 cup ingredient {i}" for i in range(10)],
+        }
+        saved.append({"recipe_key": str(n), "saved_at": datetime.now().isoformat()})
+    return {"users": {user: {"created_at": datetime.now().isoformat(), "saved_recipes": saved}}, "recipes": recipes}
+
+
+def serve(port, page_cache):
+    """Run the web app from the current directory (used as a child process by run_local)"""
+    from werkzeug.serving import make_server
+    import flask_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    flask_app.page_cache_enabled = page_cache
+    make_server("127.0.0.1", port, flask_app.app, threaded=True).serve_forever()
+
+
+def run_local(total, concurrency, recipe_count, port=3017):
+    """Serve synthetic data from a temporary directory in a separate process, page cache off and on"""
+    data_dir = tempfile.mkdtemp(prefix="nutriscan-load-")
+    os.makedirs(os.path.join(data_dir, "data"))
+    user = "whatsapp:+490000000000"
+    with open(os.path.join(data_dir, "data", "data.json"), "w", encoding="utf-8") as f:
+        json.dump(synthetic_data(user, recipe_count), f)
+
+    env = dict(os.environ, your_whatsapp=user, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    url = f"http://127.0.0.1:{port}/"
+    for page_cache in (False, True):
+        command = [sys.executable, os.path.abspath(__file__), "--serve", str(port)] + ([] if page_cache else ["--no-page-cache"])
+        server = subprocess.Popen(command, cwd=data_dir, env=env)
+        try:
+            for _ in range(100):
+                try:
+                    requests.get(url, timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+            print(f"{recipe_count} saved recipes, page cache {'on' if page_cache else 'off'}:")
+            run_all(url, total, concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the saved-recipes page")
+    parser.add_argument("--url", help="test a running instance instead of a local one on synthetic data")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--recipes", type=int, default=200, help="saved recipes in the synthetic data")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--no-page-cache", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, not args.no_page_cache)
+    elif args.url:
+        run_all(args.url, args.requests, args.concurrency)
+    else:
+        run_local(args.requests, args.concurrency, args.recipes)
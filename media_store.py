@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif", "image/heic": "heic"}
+
+
+class MediaRejected(Exception):
+    """Raised when a download is too large or not of an allowed content type"""
+
+
+class MediaStore:
+    """Content-addressed store for downloaded media
+
+    Downloads are streamed to a temporary file in CHUNK_SIZE pieces while
+    being hashed, so memory use does not depend on the file size; files
+    larger than max_file_bytes are aborted. The finished file is renamed to
+    objects/<sha256[:2]>/<sha256>.<ext>, so the same photo sent twice is
+    stored once. index.json maps media SIDs to hashes.
+
+    A background thread deletes objects not used for max_age_seconds and
+    then the least recently used ones until the store is below quota_bytes.
+    """
+
+    def __init__(self, root="img", max_file_bytes=16 * 1024 * 1024, quota_bytes=500 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600, gc_interval=3600, allowed_types=("image/",)):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.tmp_dir = self.root / "tmp"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(exist_ok=True)
+        self.index_path = self.root / "media_index.json"
+
+        self.max_file_bytes = max_file_bytes
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.allowed_types = allowed_types
+
+        self._lock = threading.Lock()
+        self._index = self._load_index()  # media SID -> "<sha256>.<ext>"
+        self.stats = {"stored": 0, "deduplicated": 0, "rejected": 0, "gc_deleted": 0, "gc_freed_bytes": 0}
+
+        self._clean_tmp()
+        if gc_interval:
+            threading.Thread(target=self._gc_loop, args=(gc_interval,), daemon=True, name="media-gc").start()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print("⚠️ Media index unreadable, starting with an empty index")
+            return {}
+
+    def _save_index(self):
+        """Atomically write the SID index (lock must be held)"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _clean_tmp(self):
+        """Remove partial downloads left by a crash"""
+        for path in self.tmp_dir.iterdir():
+            path.unlink(missing_ok=True)
+
+    def _object_path(self, name):
+        return self.objects_dir / name[:2] / name
+
+    def lookup(self, media_sid):
+        """Path of an already stored media SID, or None"""
+        with self._lock:
+            name = self._index.get(media_sid)
+        if name is None:
+            return None
+        path = self._object_path(name)
+        if not path.exists():
+            return None
+        # Stored objects age from their last use
+        os.utime(path)
+        return path
+
+    def _check_type(self, content_type):
+        content_type = (content_type or "").split(";")[0].strip().lower()
+        if not any(content_type.startswith(allowed) for allowed in self.allowed_types):
+            raise MediaRejected(f"content type {content_type or 'unknown'} not allowed")
+        return content_type
+
+    def store_response(self, media_sid, response, expected_type=None):
+        """Stream a requests response (fetched with stream=True) into the store and return its path
+
+        Raises MediaRejected for a disallowed content type or a file above
+        max_file_bytes; nothing is kept in that case.
+        """
+        try:
+            content_type = self._check_type(response.headers.get("Content-Type") or expected_type)
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > self.max_file_bytes:
+                raise MediaRejected(f"{declared} bytes exceeds the {self.max_file_bytes} byte limit")
+            return self._store_chunks(media_sid, response.iter_content(CHUNK_SIZE), content_type)
+        except MediaRejected:
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise
+        finally:
+            response.close()
+
+    def _store_chunks(self, media_sid, chunks, content_type):
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = self.tmp_dir / f"{media_sid}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_file_bytes:
+                        raise MediaRejected(f"download exceeds the {self.max_file_bytes} byte limit")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            name = f"{digest.hexdigest()}.{EXTENSIONS.get(content_type, 'bin')}"
+            path = self._object_path(name)
+            path.parent.mkdir(exist_ok=True)
+            with self._lock:
+                if path.exists():
+                    tmp_path.unlink()
+                    os.utime(path)
+                    self.stats["deduplicated"] += 1
+                else:
+                    os.replace(tmp_path, path)
+                    self.stats["stored"] += 1
+                self._index[media_sid] = name
+                self._save_index()
+            return path
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _gc_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.collect_garbage()
+            except Exception as e:
+                print(f"Error in media garbage collection: {e}")
+
+    def collect_garbage(self):
+        """Enforce max_age_seconds and quota_bytes, returns the number of deleted files"""
+        objects = []
+        for path in self.objects_dir.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+        objects.sort()  # least recently used first
+
+        cutoff = time.time() - self.max_age_seconds
+        total = sum(size for _, size, _ in objects)
+        deleted, freed = set(), 0
+        for mtime, size, path in objects:
+            if mtime >= cutoff and total <= self.quota_bytes:
+                break
+            path.unlink(missing_ok=True)
+            deleted.add(path.name)
+            total -= size
+            freed += size
+
+        if deleted:
+            with self._lock:
+                self._index = {sid: name for sid, name in self._index.items() if name not in deleted}
+                self._save_index()
+                self.stats["gc_deleted"] += len(deleted)
+                self.stats["gc_freed_bytes"] += freed
+            print(f"Media GC: deleted {len(deleted)} file(s), freed {freed / 1024 / 1024:.1f} MB")
+        return len(deleted)
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, indexed=len(self._index))
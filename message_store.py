@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ProcessedMessageStore:
+    """Persistent, bounded record of processed message SIDs
+
+    Every processed message is appended to a JSON-lines log together with its
+    conversation and message index. Two things are kept in memory:
+
+    - the highest processed index per conversation (the cursor), which covers
+      everything older than the time window
+    - the SIDs processed within the time window, capped at max_entries (LRU)
+
+    The log is compacted to the cursors plus the window entries once it grows
+    past twice the in-memory cap, so neither memory nor disk grows with uptime.
+    """
+
+    def __init__(self, path="data/processed_messages.jsonl", window_seconds=7 * 24 * 3600, max_entries=10000):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()  # sid -> processed timestamp
+        self._cursors = {}  # conversation sid -> highest processed message index
+        self._log_lines = 0
+
+        self._load()
+
+    def _load(self):
+        """Rebuild the in-memory state from the log file"""
+        if not self.path.exists():
+            return
+
+        cutoff = time.time() - self.window_seconds
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line after a crash is harmless, skip it
+                    continue
+                self._log_lines += 1
+                self._apply(entry, cutoff)
+
+        print(f"✅ Loaded {len(self._recent)} processed message(s) and {len(self._cursors)} cursor(s) from {self.path}")
+        self._compact_if_needed()
+
+    def _apply(self, entry, cutoff):
+        """Apply a single log entry to the in-memory state"""
+        conversation_sid = entry.get("conversation_sid")
+        index = entry.get("index")
+        if conversation_sid and index is not None and index > self._cursors.get(conversation_sid, -1):
+            self._cursors[conversation_sid] = index
+
+        sid = entry.get("sid")
+        if sid and entry.get("ts", 0) >= cutoff:
+            self._recent[sid] = entry["ts"]
+            self._recent.move_to_end(sid)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+
+    def contains(self, sid):
+        """Check whether a message SID was already processed"""
+        with self._lock:
+            ts = self._recent.get(sid)
+            if ts is None:
+                return False
+            if ts < time.time() - self.window_seconds:
+                del self._recent[sid]
+                return False
+            return True
+
+    def mark_processed(self, sid, conversation_sid=None, index=None):
+        """Record a message as processed and persist it"""
+        entry = {"sid": sid, "conversation_sid": conversation_sid, "index": index, "ts": time.time()}
+        with self._lock:
+            self._apply(entry, entry["ts"] - self.window_seconds)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+            self._log_lines += 1
+            self._compact_if_needed()
+
+    def advance_cursor(self, conversation_sid, index):
+        """Persist a conversation's cursor without a message, e.g. for messages processed by SID only
+
+        Does nothing unless index is above the stored cursor.
+        """
+        entry = {"sid": None, "conversation_sid": conversation_sid, "index": index, "ts": time.time()}
+        with self._lock:
+            if index is None or index <= self._cursors.get(conversation_sid, -1):
+                return
+            self._apply(entry, entry["ts"] - self.window_seconds)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+            self._log_lines += 1
+            self._compact_if_needed()
+
+    def cursors(self):
+        """Return a copy of the highest processed message index per conversation"""
+        with self._lock:
+            return dict(self._cursors)
+
+    def has_history(self, conversation_sid):
+        """Check whether anything was ever processed for a conversation"""
+        with self._lock:
+            return conversation_sid in self._cursors
+
+    def clear(self):
+        """Forget all processed messages and cursors"""
+        with self._lock:
+            self._recent.clear()
+            self._cursors.clear()
+            self._log_lines = 0
+            if self.path.exists():
+                self.path.unlink()
+
+    def _compact_if_needed(self):
+        """Rewrite the log with only the cursors and window entries (lock must be held)"""
+        if self._log_lines <= 2 * self.max_entries:
+            return
+
+        cutoff = time.time() - self.window_seconds
+        lines = [
+            json.dumps({"sid": None, "conversation_sid": conversation_sid, "index": index, "ts": 0})
+            for conversation_sid, index in self._cursors.items()
+        ]
+        lines += [
+            json.dumps({"sid": sid, "conversation_sid": None, "index": None, "ts": ts})
+            for sid, ts in self._recent.items() if ts >= cutoff
+        ]
+
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+        os.replace(tmp_path, self.path)
+        self._log_lines = len(lines)
+
+    def __len__(self):
+        return len(self._recent)
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class OutboundMessage:
+    """A queued message and the future its sender can wait on"""
+
+    __slots__ = ("conversation_sid", "body", "status", "future", "attempts", "not_before")
+
+    def __init__(self, conversation_sid, body, status=False):
+        self.conversation_sid = conversation_sid
+        self.body = body
+        self.status = status
+        self.future = Future()
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+def is_retryable(error):
+    """Retry rate limiting (429), server errors (5xx) and errors without an HTTP status (network)"""
+    status = getattr(error, 'status', None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+class OutboundMessageQueue:
+    """Sends messages in the background
+
+    - messages of one conversation are sent in order, at most one every
+      min_interval seconds per conversation
+    - failed sends are retried with exponential backoff and jitter on 429/5xx
+    - a queued status message (e.g. "Looking for recipes now...") is dropped
+      when a newer message for the same conversation is queued before it went out
+
+    enqueue() returns a Future resolving to the send function's result
+    (None for dropped status messages), so callers can wait when needed.
+    """
+
+    def __init__(self, send_func, min_interval=1.0, max_retries=4, base_delay=1.0, max_delay=30.0, num_senders=2):
+        self.send_func = send_func
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._condition = threading.Condition()
+        self._pending = {}  # conversation sid -> deque of OutboundMessage
+        self._next_allowed = {}  # conversation sid -> earliest time for the next send
+        self._in_flight = set()  # conversations with a send currently running
+        self._closed = False
+        self.stats = {"sent": 0, "failed": 0, "retried": 0, "coalesced": 0}
+
+        self._threads = []
+        for sender_id in range(num_senders):
+            thread = threading.Thread(target=self._run, name=f"outbound-{sender_id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def enqueue(self, conversation_sid, body, status=False):
+        """Queue a message and return a Future for its delivery"""
+        message = OutboundMessage(conversation_sid, body, status)
+        with self._condition:
+            if self._closed:
+                message.future.set_exception(RuntimeError("Outbound queue is closed"))
+                return message.future
+
+            queue = self._pending.setdefault(conversation_sid, deque())
+            # A newer message replaces status messages that haven't been sent yet
+            for queued in [queued for queued in queue if queued.status and queued.attempts == 0]:
+                queue.remove(queued)
+                queued.future.set_result(None)
+                self.stats["coalesced"] += 1
+
+            queue.append(message)
+            self._condition.notify()
+        return message.future
+
+    def _next_ready(self):
+        """Pick the next message that may be sent now, or the time to wait (condition must be held)"""
+        now = time.monotonic()
+        wait = None
+        for conversation_sid, queue in self._pending.items():
+            if not queue or conversation_sid in self._in_flight:
+                continue
+            ready_at = max(self._next_allowed.get(conversation_sid, 0.0), queue[0].not_before)
+            if ready_at <= now:
+                return queue.popleft(), 0
+            wait = ready_at - now if wait is None else min(wait, ready_at - now)
+        return None, wait
+
+    def _run(self):
+        """Sender loop"""
+        while True:
+            with self._condition:
+                message, wait = self._next_ready()
+                while message is None:
+                    if self._closed and not any(self._pending.values()) and not self._in_flight:
+                        return
+                    self._condition.wait(timeout=wait if wait is not None else 1.0)
+                    message, wait = self._next_ready()
+                self._in_flight.add(message.conversation_sid)
+
+            self._send(message)
+
+    def _send(self, message):
+        """Send one message and schedule a retry on transient errors"""
+        try:
+            result = self.send_func(message.conversation_sid, message.body)
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+
+        with self._condition:
+            conversation_sid = message.conversation_sid
+            self._in_flight.discard(conversation_sid)
+            self._next_allowed[conversation_sid] = time.monotonic() + self.min_interval
+
+            if error is None:
+                self.stats["sent"] += 1
+                message.future.set_result(result)
+            elif is_retryable(error) and message.attempts < self.max_retries:
+                message.attempts += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (message.attempts - 1))
+                message.not_before = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                # Put it back at the head so the conversation keeps its order
+                self._pending.setdefault(conversation_sid, deque()).appendleft(message)
+                self.stats["retried"] += 1
+                print(f"🔄 Retrying message to {conversation_sid} in {delay:.1f}s (attempt {message.attempts}): {error}")
+            else:
+                self.stats["failed"] += 1
+                print(f"❌ Giving up on message to {conversation_sid}: {error}")
+                message.future.set_exception(error)
+
+            if not self._pending.get(conversation_sid):
+                self._pending.pop(conversation_sid, None)
+            self._condition.notify_all()
+
+    def pending_count(self):
+        """Number of messages waiting to be sent"""
+        with self._condition:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def close(self, timeout=None):
+        """Stop accepting messages and wait until the queued ones are sent"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
@@ -0,0 +1,148 @@
+import json
+
+# Nutrients kept from Spoonacular's nutrition tree (Spoonacular name -> our key)
+NAEHRWERTE = {"Calories": "kalorien", "Protein": "protein", "Fat": "fett", "Carbohydrates": "kohlenhydrate"}
+
+
+def naehrwerte_zusammenfassen(nutrition):
+    """Compact {key: amount} summary of a Spoonacular nutrition tree, None without nutrients"""
+    if not nutrition:
+        return None
+    summary = {
+        NAEHRWERTE[nutrient["name"]]: nutrient.get("amount")
+        for nutrient in nutrition.get("nutrients", []) if nutrient.get("name") in NAEHRWERTE
+    }
+    return summary or None
+
+
+class Recipe:
+    """A recipe as suggested, cached and saved
+
+    Uses the German field names of the stored format, so to_dict() output is
+    the data/data.json layout and old dicts load with from_dict(). Only a
+    compact nutrition summary is kept, never the full Spoonacular tree.
+
+    The instructions (zubereitung) are the large part and are optional: a
+    search summary or a recipe restored from a session has none, which
+    details_geladen reports, and the full recipe is loaded on demand (see
+    RecipeDetailLoader).
+    """
+
+    __slots__ = (
+        "id", "rezeptname", "bild_url", "gesundheitsbewertung", "rezept_url", "video_url",
+        "zutaten", "zutaten_namen", "naehrwerte", "saved_at", "_zubereitung",
+    )
+
+    def __init__(self, id=None, rezeptname="Unknown Recipe", bild_url="", gesundheitsbewertung=None, rezept_url="",
+                 video_url="", zutaten=None, zutaten_namen=None, zubereitung=None, naehrwerte=None, saved_at=None):
+        self.id = id
+        self.rezeptname = rezeptname
+        self.bild_url = bild_url
+        self.gesundheitsbewertung = gesundheitsbewertung
+        self.rezept_url = rezept_url
+        self.video_url = video_url
+        self.zutaten = zutaten or []
+        self.zutaten_namen = zutaten_namen or []
+        self.naehrwerte = naehrwerte
+        self.saved_at = saved_at
+        self._zubereitung = zubereitung
+
+    @property
+    def details_geladen(self):
+        """Whether the instructions are present, i.e. this is the full recipe"""
+        return self._zubereitung is not None
+
+    @property
+    def zubereitung(self):
+        return self._zubereitung or []
+
+    @zubereitung.setter
+    def zubereitung(self, steps):
+        self._zubereitung = steps
+
+    @classmethod
+    def from_spoonacular(cls, detail_data):
+        """Recipe from a /recipes/{id}/information or informationBulk payload"""
+        zutaten = detail_data.get("extendedIngredients", [])
+        return cls(
+            id=detail_data.get("id"),
+            rezeptname=detail_data.get("title"),
+            bild_url=detail_data.get("image"),
+            gesundheitsbewertung=detail_data.get("healthScore"),
+            rezept_url=detail_data.get("sourceUrl"),
+            video_url=detail_data.get("video", "Kein Video verfügbar"),
+            zubereitung=[step["step"] for instruction in detail_data.get("analyzedInstructions", []) for step in instruction.get("steps", [])],
+            zutaten=[z["original"] for z in zutaten],
+            zutaten_namen=[z.get("name", "") for z in zutaten],
+            naehrwerte=naehrwerte_zusammenfassen(detail_data.get("nutrition")),
+        )
+
+    @classmethod
+    def from_search_result(cls, result):
+        """Recipe summary from a findByIngredients result, without details"""
+        zutaten = result.get("usedIngredients", []) + result.get("missedIngredients", [])
+        titel = result.get("title") or ""
+        slug = "-".join(titel.lower().split())
+        return cls(
+            id=result.get("id"),
+            rezeptname=titel,
+            bild_url=result.get("image"),
+            rezept_url=f"https://spoonacular.com/recipes/{slug}-{result.get('id')}",
+            zutaten=[z.get("original") or z.get("name", "") for z in zutaten],
+            zutaten_namen=[z.get("name", "") for z in zutaten],
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Recipe from the stored format, including old entries with the full nutrition tree"""
+        if isinstance(data, cls):
+            return data
+        naehrwerte = data.get("naehrwerte")
+        if naehrwerte is None and "nutrition" in data:
+            naehrwerte = naehrwerte_zusammenfassen(data["nutrition"])
+        zubereitung = data.get("zubereitung")
+        if data.get("details_geladen") is False:
+            # Summaries stored before the Recipe type had an empty placeholder here
+            zubereitung = None
+        return cls(
+            id=data.get("id"),
+            rezeptname=data.get("rezeptname", "Unknown Recipe"),
+            bild_url=data.get("bild_url", ""),
+            gesundheitsbewertung=data.get("gesundheitsbewertung"),
+            rezept_url=data.get("rezept_url", ""),
+            video_url=data.get("video_url", ""),
+            zutaten=data.get("zutaten"),
+            zutaten_namen=data.get("zutaten_namen"),
+            zubereitung=zubereitung,
+            naehrwerte=naehrwerte,
+            saved_at=data.get("saved_at"),
+        )
+
+    def to_dict(self, include_details=True):
+        """Stored format; without include_details the instructions are left out (sessions)"""
+        data = {
+            "id": self.id,
+            "rezeptname": self.rezeptname,
+            "bild_url": self.bild_url,
+            "gesundheitsbewertung": self.gesundheitsbewertung,
+            "rezept_url": self.rezept_url,
+            "video_url": self.video_url,
+            "zutaten": self.zutaten,
+            "zutaten_namen": self.zutaten_namen,
+            "naehrwerte": self.naehrwerte,
+        }
+        if include_details and self._zubereitung is not None:
+            data["zubereitung"] = self._zubereitung
+        if self.saved_at is not None:
+            data["saved_at"] = self.saved_at
+        return data
+
+    def to_json(self, include_details=True):
+        return json.dumps(self.to_dict(include_details), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def __repr__(self):
+        return f"Recipe(id={self.id!r}, rezeptname={self.rezeptname!r})"
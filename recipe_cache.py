@@ -0,0 +1,109 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# Spoonacular charges about one point per recipe information lookup
+POINTS_PER_RECIPE = 1.0
+
+
+class RecipeCache:
+    """SQLite cache of normalized recipe details keyed by Spoonacular recipe id
+
+    Entries older than ttl_seconds count as misses so they get refreshed from
+    the API. The table is capped at max_entries, the least recently read
+    entries are evicted first.
+    """
+
+    def __init__(self, path="data/recipe_cache.sqlite3", ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recipes ("
+            "id INTEGER PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS recipes_last_access ON recipes (last_access)")
+        self._db.commit()
+
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get_many(self, recipe_ids):
+        """Return {id: recipe} for the ids with a fresh cache entry"""
+        if not recipe_ids:
+            return {}
+
+        now = time.time()
+        placeholders = ",".join("?" for _ in recipe_ids)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, data, fetched_at FROM recipes WHERE id IN ({placeholders})", list(recipe_ids)
+            ).fetchall()
+
+            found = {}
+            for recipe_id, data, fetched_at in rows:
+                if fetched_at < now - self.ttl_seconds:
+                    self._stats["stale"] += 1
+                    continue
+                found[recipe_id] = json.loads(data)
+
+            if found:
+                self._db.executemany("UPDATE recipes SET last_access = ? WHERE id = ?", [(now, recipe_id) for recipe_id in found])
+                self._db.commit()
+
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(recipe_ids) - len(found)
+        return found
+
+    def get(self, recipe_id):
+        """Return a single cached recipe or None"""
+        return self.get_many([recipe_id]).get(recipe_id)
+
+    def put_many(self, recipes):
+        """Store normalized recipes (dicts with an "id")"""
+        now = time.time()
+        rows = [
+            (recipe["id"], json.dumps(recipe, ensure_ascii=False), now, now)
+            for recipe in recipes if recipe.get("id") is not None
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO recipes (id, data, fetched_at, last_access) VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Delete least recently read entries beyond max_entries (lock must be held)"""
+        count = self._db.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM recipes WHERE id IN (SELECT id FROM recipes ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def all_recipes(self):
+        """Iterate over every cached recipe, fresh or stale"""
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM recipes").fetchall()
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def stats(self):
+        """Return hits, misses, entry count and the estimated API points saved"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                entries=entries,
+                hit_rate=self._stats["hits"] / lookups if lookups else 0.0,
+                points_saved=self._stats["hits"] * POINTS_PER_RECIPE,
+            )
@@ -0,0 +1,333 @@
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Offline recipe corpus with an inverted ingredient -> recipe index.
+#
+#   python recipe_index.py build [--import payloads.json ...]   -> write data/recipe_index.npz
+#   python recipe_index.py query tomato cheese [--ranking 2]     -> search the built index
+#   python recipe_index.py bench [--synthetic 100000]            -> time queries
+
+DEFAULT_PATH = "data/recipe_index.npz"
+# Spoonacular detail payloads (list, {id: payload} or JSON lines) imported on every build
+DEFAULT_IMPORTS = ("recipes.json",)
+
+# Ignored like Spoonacular's ignorePantry: they never count as missing
+PANTRY = {"water", "salt", "pepper", "flour", "sugar", "oil", "olive oil", "vegetable oil", "butter", "baking powder", "baking soda"}
+
+TOKEN_PATTERN = re.compile(r"[a-zäöüß]+")
+
+
+def _stem(token):
+    """Crude English singular, so "tomatoes" matches "tomato" """
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def ingredient_tokens(name):
+    return frozenset(_stem(token) for token in TOKEN_PATTERN.findall(name.lower()))
+
+
+def recipe_summary(payload):
+    """(id, title, image, ingredient names) from a Spoonacular payload or one of our normalized recipes"""
+    recipe_id = payload.get("id")
+    if recipe_id is None:
+        return None
+
+    if "extendedIngredients" in payload:
+        names = [z.get("name") or z.get("original", "") for z in payload["extendedIngredients"]]
+        return recipe_id, payload.get("title") or "", payload.get("image") or "", names
+
+    # Stored format (Recipe.to_dict). Older saved entries only have the original lines
+    # ("2 cloves garlic, minced"), which would become bogus vocabulary terms: skip them
+    names = payload.get("zutaten_namen")
+    if not names:
+        return None
+    return recipe_id, payload.get("rezeptname") or "", payload.get("bild_url") or "", names
+
+
+class RecipeIndex:
+    """Ingredient search over a local recipe corpus
+
+    Recipes are rows of a sparse recipe x ingredient matrix, kept both as CSR
+    (ingredients of a recipe) and CSC (posting list of an ingredient). A query
+    ingredient matches every vocabulary entry containing all of its tokens
+    ("tomato" matches "cherry tomatoes"); used and missed counts for all recipes
+    are then computed with np.bincount over the concatenated posting lists.
+    """
+
+    def __init__(self, recipe_ids, titles, images, vocabulary, indptr, indices):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.titles = np.asarray(titles, dtype=str)
+        self.images = np.asarray(images, dtype=str)
+        self.vocabulary = np.asarray(vocabulary, dtype=str)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+        num_recipes, num_terms = len(self.recipe_ids), len(self.vocabulary)
+        self.counts = np.diff(self.indptr)
+        rows = np.repeat(np.arange(num_recipes, dtype=np.int32), self.counts)
+
+        # CSC: recipes of each vocabulary entry
+        order = np.argsort(self.indices, kind="stable")
+        self.postings = rows[order]
+        self.posting_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=num_terms))))
+
+        self.pantry = np.array([term in PANTRY for term in self.vocabulary], dtype=bool)
+        self.pantry_counts = np.bincount(rows[self.pantry[self.indices]], minlength=num_recipes)
+
+        # token -> vocabulary ids containing it
+        token_terms = {}
+        for term_id, term in enumerate(self.vocabulary):
+            for token in ingredient_tokens(term):
+                token_terms.setdefault(token, []).append(term_id)
+        self._token_terms = {token: np.array(ids, dtype=np.int32) for token, ids in token_terms.items()}
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    @classmethod
+    def build(cls, recipes):
+        """Build from (id, title, image, ingredient names) tuples"""
+        vocabulary = {}
+        recipe_ids, titles, images, indptr, indices = [], [], [], [0], []
+        for recipe_id, title, image, names in recipes:
+            term_ids = set()
+            for name in names:
+                term = " ".join(name.lower().split())
+                if term:
+                    term_ids.add(vocabulary.setdefault(term, len(vocabulary)))
+            recipe_ids.append(recipe_id)
+            titles.append(title)
+            images.append(image)
+            indices.extend(sorted(term_ids))
+            indptr.append(len(indices))
+
+        terms = sorted(vocabulary, key=vocabulary.get)
+        return cls(recipe_ids, titles, images, terms, indptr, indices)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with np.load(path) as data:
+            return cls(data["recipe_ids"], data["titles"], data["images"], data["vocabulary"], data["indptr"], data["indices"])
+
+    def save(self, path=DEFAULT_PATH):
+        path = Path(path)
+        path.parent.mkdir(exist_ok=True)
+        # np.savez appends .npz to names without it, so write the temp file with that suffix
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez_compressed(
+            tmp_path, recipe_ids=self.recipe_ids, titles=self.titles, images=self.images,
+            vocabulary=self.vocabulary, indptr=self.indptr, indices=self.indices
+        )
+        tmp_path.replace(path)
+
+    def _term_ids(self, ingredient):
+        """Vocabulary ids whose tokens include all tokens of the query ingredient"""
+        tokens = ingredient_tokens(ingredient)
+        if not tokens:
+            return None
+        term_ids = None
+        for token in tokens:
+            ids = self._token_terms.get(token)
+            if ids is None:
+                return None
+            term_ids = ids if term_ids is None else np.intersect1d(term_ids, ids, assume_unique=True)
+        return term_ids if len(term_ids) else None
+
+    def _recipes_of(self, term_ids):
+        if len(term_ids) == 1:
+            return self.postings[self.posting_ptr[term_ids[0]]:self.posting_ptr[term_ids[0] + 1]]
+        return np.concatenate([self.postings[self.posting_ptr[t]:self.posting_ptr[t + 1]] for t in term_ids])
+
+    def search(self, ingredients, number=3, ranking=1, ignore_pantry=True):
+        """Rank recipes like findByIngredients and return results in its response format
+
+        ranking=1 maximizes used ingredients (fewest missing as tie-break),
+        ranking=2 minimizes missing ingredients (most used as tie-break).
+        """
+        num_recipes = len(self.recipe_ids)
+        matched_terms = [ids for ids in (self._term_ids(item) for item in ingredients if item and item.strip()) if ids is not None]
+        if not matched_terms or not num_recipes or number <= 0:
+            return []
+
+        # Used: how many query ingredients each recipe contains
+        used = np.zeros(num_recipes, dtype=np.int32)
+        for term_ids in matched_terms:
+            if len(term_ids) == 1:
+                # A recipe appears at most once in a single posting list
+                used[self._recipes_of(term_ids)] += 1
+            else:
+                used += np.bincount(self._recipes_of(term_ids), minlength=num_recipes) > 0
+
+        # Missed: recipe ingredients not covered by any query ingredient
+        all_terms = np.unique(np.concatenate(matched_terms))
+        totals = self.counts
+        if ignore_pantry:
+            all_terms = all_terms[~self.pantry[all_terms]]
+            totals = self.counts - self.pantry_counts
+        covered = np.bincount(self._recipes_of(all_terms), minlength=num_recipes) if len(all_terms) else 0
+        missed = np.maximum(totals - covered, 0)
+
+        # One integer key per recipe instead of a lexsort, recipes without any used ingredient sort last
+        scale = int(self.counts.max()) + 1
+        if ranking == 2:
+            score = np.where(used > 0, (scale - missed) * scale + used, -1)
+        else:
+            score = np.where(used > 0, used * scale + (scale - missed), -1)
+        number = min(number, num_recipes)
+        top = np.argpartition(-score, number - 1)[:number]
+        top = top[np.argsort(-score[top], kind="stable")]
+        top = top[score[top] >= 0]
+
+        covered_set = set(all_terms.tolist())
+        results = []
+        for row in top:
+            term_ids = self.indices[self.indptr[row]:self.indptr[row + 1]]
+            used_names = [self.vocabulary[t] for t in term_ids if t in covered_set]
+            missed_names = [self.vocabulary[t] for t in term_ids if t not in covered_set and not (ignore_pantry and self.pantry[t])]
+            results.append({
+                "id": int(self.recipe_ids[row]),
+                "title": str(self.titles[row]),
+                "image": str(self.images[row]),
+                "usedIngredientCount": int(used[row]),
+                "missedIngredientCount": int(missed[row]),
+                "usedIngredients": [{"name": str(name)} for name in used_names],
+                "missedIngredients": [{"name": str(name)} for name in missed_names],
+                "unusedIngredients": [],
+                "likes": 0,
+            })
+        return results
+
+
+def load_index(path=DEFAULT_PATH):
+    """Load the index if it has been built, otherwise None"""
+    if not Path(path).exists():
+        return None
+    started = time.perf_counter()
+    index = RecipeIndex.load(path)
+    print(f"Local recipe index: {len(index)} recipes, {len(index.vocabulary)} ingredients ({(time.perf_counter() - started) * 1000:.0f} ms)")
+    return index
+
+
+def _read_payloads(path):
+    """Detail payloads from a JSON list, an {id: payload} object or JSON lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return list(data.values()) if "id" not in data else [data]
+    return data
+
+
+def collect_recipes(imports=DEFAULT_IMPORTS, data_dir="data", cache_path="data/recipe_cache.sqlite3"):
+    """Every recipe we know of: recipe cache, saved recipes and imported payloads (later sources win)"""
+    recipes = {}
+
+    def add(payload, source):
+        summary = recipe_summary(payload) if isinstance(payload, dict) else None
+        if summary:
+            recipes[summary[0]] = summary
+            counts[source] = counts.get(source, 0) + 1
+
+    counts = {}
+    if Path(cache_path).exists():
+        from recipe_cache import RecipeCache
+        for recipe in RecipeCache(cache_path).all_recipes():
+            add(recipe, "cache")
+
+    if Path(data_dir).exists():
+        from storage import open_storage
+        for recipe in open_storage(data_dir=data_dir).load_all().get("recipes", {}).values():
+            add(recipe, "saved")
+
+    for path in imports:
+        if Path(path).exists():
+            for payload in _read_payloads(path):
+                add(payload, path)
+
+    print(f"Recipes per source: {counts}")
+    return list(recipes.values())
+
+
+def synthetic_recipes(count, vocabulary_size=2000, seed=1):
+    """Random recipes for benchmarking, ingredient popularity roughly Zipf-distributed"""
+    rng = random.Random(seed)
+    base = ["tomato", "cheese", "pasta", "chicken", "rice", "onion", "garlic", "carrot", "potato", "egg",
+            "milk", "butter", "spinach", "beef", "mushroom", "bell pepper", "zucchini", "basil", "olive oil", "lemon"]
+    vocabulary = base + [f"ingredient{n}" for n in range(vocabulary_size - len(base))]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    for recipe_id in range(count):
+        names = set(rng.choices(vocabulary, weights=weights, k=rng.randint(5, 15)))
+        yield recipe_id, f"Recipe {recipe_id}", "", sorted(names)
+
+
+def run_benchmark(index, queries=200, number=10):
+    rng = random.Random(2)
+    common = [str(term) for term in index.vocabulary[:50]] or ["tomato"]
+    timings = []
+    for _ in range(queries):
+        query = rng.sample(common, min(len(common), rng.randint(2, 5)))
+        started = time.perf_counter()
+        index.search(query, number=number, ranking=rng.choice((1, 2)))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{queries} queries over {len(index)} recipes: "
+          f"p50 {timings[len(timings) // 2]:.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local recipe index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build the index from the recipe cache, data.json and imports")
+    build.add_argument("--import", dest="imports", nargs="*", default=[], help="extra files with Spoonacular detail payloads")
+    build.add_argument("--output", default=DEFAULT_PATH)
+
+    query = commands.add_parser("query", help="search the built index")
+    query.add_argument("ingredients", nargs="+")
+    query.add_argument("--number", type=int, default=3)
+    query.add_argument("--ranking", type=int, choices=(1, 2), default=1)
+    query.add_argument("--index", default=DEFAULT_PATH)
+
+    bench = commands.add_parser("bench", help="time queries against the built index or a synthetic corpus")
+    bench.add_argument("--synthetic", type=int, default=0, help="number of synthetic recipes instead of the built index")
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--index", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        index = RecipeIndex.build(collect_recipes(DEFAULT_IMPORTS + tuple(args.imports)))
+        index.save(args.output)
+        print(f"{len(index)} recipes, {len(index.vocabulary)} ingredients -> {args.output} ({time.perf_counter() - started:.1f} s)")
+    elif args.command == "query":
+        index = load_index(args.index)
+        if index is None:
+            sys.exit(f"{args.index} not found, run 'python recipe_index.py build' first")
+        for result in index.search(args.ingredients, number=args.number, ranking=args.ranking):
+            print(f"{result['id']:>8}  used {result['usedIngredientCount']}  missed {result['missedIngredientCount']}  {result['title']}")
+    else:
+        if args.synthetic:
+            started = time.perf_counter()
+            index = RecipeIndex.build(synthetic_recipes(args.synthetic))
+            print(f"Built synthetic index of {len(index)} recipes in {time.perf_counter() - started:.1f} s")
+        else:
+            index = load_index(args.index)
+            if index is None:
+                sys.exit(f"{args.index} not found, run 'python recipe_index.py build' or use --synthetic N")
+        run_benchmark(index, args.queries)
@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+
+class RecipeDetailLoader:
+    """Loads full recipe details in the background, once per recipe at a time
+
+    fetch_details(recipe_ids, priority) must return (recipes, errors) like
+    api_spoon.get_recipe_details. prefetch() starts a fetch without waiting;
+    get() waits for the details of one recipe. A recipe that is already being
+    fetched is not requested again, callers share the in-flight Future.
+    Finished fetches are not kept here, the recipe cache behind
+    fetch_details makes repeated lookups free.
+    """
+
+    def __init__(self, fetch_details, max_workers=2):
+        self.fetch_details = fetch_details
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recipe-details")
+        self._lock = threading.Lock()
+        self._in_flight = {}  # recipe id -> Future
+        self.stats = {"fetches": 0, "recipes": 0, "shared": 0, "failed": 0}
+
+    def prefetch(self, recipe_ids, priority="background"):
+        """Start fetching details of recipes that are not already in flight"""
+        self._start([recipe_id for recipe_id in recipe_ids if recipe_id is not None], priority)
+
+    def get(self, recipe_id, timeout=30, priority="interactive"):
+        """Wait for the details of a recipe, or None if they could not be loaded"""
+        futures, started = self._start([recipe_id], priority)
+        recipe = self._wait(futures[recipe_id], timeout)
+        if recipe is None and not started:
+            # The shared fetch may have been a background prefetch that the budget limited to the cache
+            futures, _ = self._start([recipe_id], priority)
+            recipe = self._wait(futures[recipe_id], timeout)
+        return recipe
+
+    def _wait(self, future, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            print("Timed out waiting for recipe details")
+            return None
+
+    def _start(self, recipe_ids, priority):
+        """Return ({id: Future}, started) where started tells whether this call submitted a new fetch"""
+        futures, new_ids = {}, []
+        with self._lock:
+            for recipe_id in recipe_ids:
+                future = self._in_flight.get(recipe_id)
+                if future is None:
+                    future = self._in_flight[recipe_id] = Future()
+                    new_ids.append(recipe_id)
+                else:
+                    self.stats["shared"] += 1
+                futures[recipe_id] = future
+            if new_ids:
+                self.stats["fetches"] += 1
+                self.stats["recipes"] += len(new_ids)
+
+        if new_ids:
+            self._executor.submit(self._fetch, new_ids, {recipe_id: futures[recipe_id] for recipe_id in new_ids}, priority)
+        return futures, bool(new_ids)
+
+    def _fetch(self, recipe_ids, futures, priority):
+        try:
+            recipes, _ = self.fetch_details(recipe_ids, priority)
+        except Exception as e:
+            print(f"Error fetching recipe details: {e}")
+            recipes = []
+        found = {recipe.id: recipe for recipe in recipes}
+
+        with self._lock:
+            for recipe_id in recipe_ids:
+                del self._in_flight[recipe_id]
+            self.stats["failed"] += len(recipe_ids) - len(found)
+        for recipe_id in recipe_ids:
+            futures[recipe_id].set_result(found.get(recipe_id))
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._in_flight))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
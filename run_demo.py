@@ -17,6 +17,6 @@ else:
         rezepte = get_detailed_recipes(zutatenliste, number=3)
         print("\nGefundene detaillierte Rezepte:")
         for rezept in rezepte:
-            print(f"{rezept['rezeptname']} (Health Score: {rezept.get('gesundheitsbewertung', 'k.A.')})")
-            print(f"Link: {rezept.get('rezept_url')}")
-            print(f"Video: {rezept.get('video_url')}\n")
\ No newline at end of file
+            print(f"{rezept.rezeptname} (Health Score: {rezept.gesundheitsbewertung or 'k.A.'})")
+            print(f"Link: {rezept.rezept_url}")
+            print(f"Video: {rezept.video_url}\n")
\ No newline at end of file
@@ -0,0 +1,152 @@
+import base64
+import json
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+import numpy as np
+
+from recipe_index import ingredient_tokens
+from storage import recipe_key
+
+
+def encode_cursor(saved_at, key):
+    """Opaque pagination cursor for the entry (saved_at, recipe_key)"""
+    return base64.urlsafe_b64encode(json.dumps([saved_at, key]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(saved_at, recipe_key) of a cursor, raises ValueError for a malformed one"""
+    try:
+        saved_at, key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    if not isinstance(saved_at, str) or not isinstance(key, str):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return saved_at, key
+
+
+class SavedRecipeIndex:
+    """Filter and page one user's saved recipes without scanning them
+
+    Recipes are kept sorted by (saved_at, recipe_key), which is the keyset:
+    a page ends at an entry and the next one starts strictly before it
+    (newest first), so pages stay stable while recipes are saved. A
+    saved_at range is a bisection of that order. Health scores are a sorted
+    array with the matching positions, so a score range is two
+    searchsorted calls. Ingredient names form an inverted index like
+    RecipeIndex: "tomato" matches every name containing all of its tokens
+    and the posting lists of those names give the recipes.
+    """
+
+    def __init__(self, recipes):
+        entries = sorted(recipes, key=lambda recipe: (recipe.get("saved_at") or "", recipe_key(recipe)))
+        self.recipes = entries
+        self.keys = [(recipe.get("saved_at") or "", recipe_key(recipe)) for recipe in entries]
+        self.saved_at = [saved_at for saved_at, _ in self.keys]
+
+        scored = [(recipe["gesundheitsbewertung"], position) for position, recipe in enumerate(entries)
+                  if isinstance(recipe.get("gesundheitsbewertung"), (int, float))]
+        scored.sort()
+        self.health_scores = np.array([score for score, _ in scored], dtype=np.float64)
+        self.health_positions = np.array([position for _, position in scored], dtype=np.int32)
+
+        postings, token_names = {}, {}
+        for position, recipe in enumerate(entries):
+            for name in recipe.get("zutaten_namen") or recipe.get("zutaten") or []:
+                name = " ".join(name.lower().split())
+                if name:
+                    postings.setdefault(name, set()).add(position)
+        self.names = list(postings)
+        self.postings = [np.array(sorted(postings[name]), dtype=np.int32) for name in self.names]
+        for name_id, name in enumerate(self.names):
+            for token in ingredient_tokens(name):
+                token_names.setdefault(token, set()).add(name_id)
+        self._token_names = token_names
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def _health_mask(self, min_health, max_health):
+        low = 0 if min_health is None else np.searchsorted(self.health_scores, min_health, side="left")
+        high = len(self.health_scores) if max_health is None else np.searchsorted(self.health_scores, max_health, side="right")
+        mask = np.zeros(len(self.recipes), dtype=bool)
+        mask[self.health_positions[low:high]] = True
+        return mask
+
+    def _ingredient_mask(self, ingredient):
+        mask = np.zeros(len(self.recipes), dtype=bool)
+        tokens = ingredient_tokens(ingredient)
+        if not tokens:
+            return mask
+        name_ids = set.intersection(*(self._token_names.get(token, set()) for token in tokens))
+        if name_ids:
+            mask[np.concatenate([self.postings[name_id] for name_id in name_ids])] = True
+        return mask
+
+    def page(self, limit=24, cursor=None, min_health=None, max_health=None, ingredients=(),
+             saved_after=None, saved_before=None):
+        """One page of matching recipes, newest first
+
+        saved_after is inclusive and saved_before exclusive (ISO strings),
+        health bounds are inclusive and every ingredient must match. cursor
+        is the next_cursor of the previous page. Returns
+        {"recipes": [...], "next_cursor": str or None, "total": matches}.
+        """
+        low = bisect_left(self.saved_at, saved_after) if saved_after else 0
+        high = bisect_left(self.saved_at, saved_before) if saved_before else len(self.recipes)
+        end = min(high, bisect_left(self.keys, decode_cursor(cursor))) if cursor else high
+
+        mask = None
+        if min_health is not None or max_health is not None:
+            mask = self._health_mask(min_health, max_health)
+        for ingredient in ingredients:
+            ingredient_mask = self._ingredient_mask(ingredient)
+            mask = ingredient_mask if mask is None else mask & ingredient_mask
+
+        if mask is None:
+            total = max(0, high - low)
+            positions = range(end - 1, max(low, end - limit) - 1, -1)
+            has_more = end - limit > low
+        else:
+            total = int(np.count_nonzero(mask[low:high])) if high > low else 0
+            matches = np.flatnonzero(mask[low:end]) + low if end > low else np.empty(0, dtype=np.int64)
+            positions = matches[::-1][:limit].tolist()
+            has_more = len(matches) > limit
+
+        recipes = [self.recipes[position] for position in positions]
+        next_cursor = encode_cursor(*self.keys[positions[-1]]) if has_more and recipes else None
+        return {"recipes": recipes, "next_cursor": next_cursor, "total": total}
+
+
+class SavedRecipeIndexes:
+    """Per-user SavedRecipeIndex, rebuilt when storage.version() changes"""
+
+    def __init__(self, storage, max_users=64):
+        self.storage = storage
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()  # phone -> (storage version, SavedRecipeIndex)
+        self.stats = {"builds": 0, "hits": 0}
+
+    def get(self, phone_number):
+        version, _ = self.storage.version()
+        with self._lock:
+            cached = self._indexes.get(phone_number)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(phone_number)
+                self.stats["hits"] += 1
+                return cached[1]
+
+        index = SavedRecipeIndex(self.storage.saved_recipes(phone_number))
+        with self._lock:
+            self._indexes[phone_number] = (version, index)
+            self._indexes.move_to_end(phone_number)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            self.stats["builds"] += 1
+        return index
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, users=len(self._indexes))
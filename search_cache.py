@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def canonical_ingredients(ingredients):
+    """Order-, case- and whitespace-independent form of an ingredient list"""
+    return frozenset(item.strip().lower() for item in ingredients if item and item.strip())
+
+
+class SearchCache:
+    """In-memory cache of findByIngredients results
+
+    Keyed on the canonical ingredient set plus ranking and ignore_pantry, so
+    "tomato, cheese" and "Cheese, tomato" share one entry. Entries expire after
+    ttl_seconds and the least recently used are evicted beyond max_entries.
+
+    Concurrent identical queries are coalesced (single flight): only the first
+    caller hits the API, the others wait for its result. With allow_approximate
+    a miss may be answered from a cached query whose ingredient set differs by
+    at most max_difference items (subset or superset).
+    """
+
+    def __init__(self, ttl_seconds=6 * 3600, max_entries=1000, allow_approximate=False, max_difference=1):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.allow_approximate = allow_approximate
+        self.max_difference = max_difference
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, number, results)
+        self._in_flight = {}  # key -> Future
+        self.stats = {"hits": 0, "approximate_hits": 0, "coalesced": 0, "misses": 0}
+
+    def get_or_fetch(self, ingredients, number, ranking, ignore_pantry, fetch):
+        """Return cached results or call fetch(sorted_ingredients, number, ranking, ignore_pantry)
+
+        fetch returns a list of results, or None on errors (which are not cached).
+        """
+        ingredient_set = canonical_ingredients(ingredients)
+        key = (ingredient_set, ranking, ignore_pantry)
+
+        with self._lock:
+            results = self._lookup(key, number)
+            if results is not None:
+                self.stats["hits"] += 1
+                return results
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                owner = False
+            else:
+                results = self._lookup_approximate(key, number) if self.allow_approximate else None
+                if results is not None:
+                    self.stats["approximate_hits"] += 1
+                    return results
+                self.stats["misses"] += 1
+                future = Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            results = future.result()
+            return list(results[:number]) if results is not None else []
+
+        try:
+            results = fetch(sorted(ingredient_set), number, ranking, ignore_pantry)
+        except Exception as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if results is not None:
+                self._store(key, number, results)
+        future.set_result(results)
+        return list(results) if results is not None else []
+
+    def _lookup(self, key, number):
+        """Exact lookup, served if the entry is fresh and has enough results (lock must be held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, stored_number, results = entry
+        if stored_at < time.time() - self.ttl_seconds:
+            del self._entries[key]
+            return None
+        if stored_number < number:
+            # Cached with a smaller "number", a larger request needs a new search
+            return None
+        self._entries.move_to_end(key)
+        return list(results[:number])
+
+    def _lookup_approximate(self, key, number):
+        """Reuse the closest cached subset or superset query (lock must be held)"""
+        ingredient_set, ranking, ignore_pantry = key
+        cutoff = time.time() - self.ttl_seconds
+        best_key, best_difference = None, self.max_difference + 1
+
+        for cached_key, (stored_at, stored_number, _) in self._entries.items():
+            cached_set, cached_ranking, cached_pantry = cached_key
+            if (cached_ranking, cached_pantry) != (ranking, ignore_pantry) or stored_at < cutoff or stored_number < number:
+                continue
+            if not (cached_set <= ingredient_set or cached_set >= ingredient_set):
+                continue
+            difference = len(cached_set ^ ingredient_set)
+            if difference < best_difference:
+                best_key, best_difference = cached_key, difference
+
+        return self._lookup(best_key, number) if best_key else None
+
+    def _store(self, key, number, results):
+        """Insert an entry and evict beyond max_entries (lock must be held)"""
+        self._entries[key] = (time.time(), number, list(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from recipe import Recipe
+
+
+class UserSession:
+    """Conversation state of a single WhatsApp user"""
+
+    __slots__ = ("address", "conversation_sid", "last_suggested_recipes", "state", "updated_at")
+
+    def __init__(self, address, conversation_sid=None, last_suggested_recipes=None, state="idle", updated_at=None):
+        self.address = address
+        self.conversation_sid = conversation_sid
+        self.last_suggested_recipes = last_suggested_recipes or []
+        self.state = state
+        self.updated_at = updated_at or time.time()
+
+    def to_dict(self):
+        return {
+            "address": self.address,
+            "conversation_sid": self.conversation_sid,
+            # Instructions are left out, they are reloaded from the recipe cache on selection
+            "last_suggested_recipes": [recipe.to_dict(include_details=False) for recipe in self.last_suggested_recipes],
+            "state": self.state,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            address=data["address"],
+            conversation_sid=data.get("conversation_sid"),
+            last_suggested_recipes=[Recipe.from_dict(recipe) for recipe in data.get("last_suggested_recipes", [])],
+            state=data.get("state", "idle"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+class SessionStore:
+    """Sessions keyed by sender address with TTL and LRU eviction
+
+    At most max_sessions sessions are kept in memory; the least recently used
+    one is evicted first and sessions idle for longer than ttl_seconds expire.
+    With a path the sessions are also written to SQLite, so evicted sessions
+    can be reloaded and sessions survive restarts.
+    """
+
+    def __init__(self, ttl_seconds=24 * 3600, max_sessions=10000, path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # address -> UserSession, most recently used last
+        self._lock = threading.Lock()
+        self._writes_since_purge = 0
+
+        self._db = None
+        if path:
+            Path(path).parent.mkdir(exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (address TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, address, conversation_sid=None):
+        """Return the session for an address, creating a fresh one if none is active"""
+        with self._lock:
+            session = self._sessions.get(address)
+            if session is not None and self._is_expired(session):
+                del self._sessions[address]
+                session = None
+
+            if session is None:
+                session = self._load(address) or UserSession(address, conversation_sid)
+                self._sessions[address] = session
+                self._evict_lru()
+            else:
+                self._sessions.move_to_end(address)
+
+            if conversation_sid:
+                session.conversation_sid = conversation_sid
+            return session
+
+    def save(self, session):
+        """Store a session after it was changed"""
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.address] = session
+            self._sessions.move_to_end(session.address)
+            self._evict_lru()
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (address, data, updated_at) VALUES (?, ?, ?)",
+                    (session.address, json.dumps(session.to_dict(), ensure_ascii=False), session.updated_at)
+                )
+                self._db.commit()
+
+            self._writes_since_purge += 1
+            if self._writes_since_purge >= 100:
+                self._purge_expired()
+
+    def _load(self, address):
+        """Load a non-expired session from disk (lock must be held)"""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT data FROM sessions WHERE address = ? AND updated_at >= ?",
+            (address, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return UserSession.from_dict(json.loads(row[0])) if row else None
+
+    def _is_expired(self, session):
+        return session.updated_at < time.time() - self.ttl_seconds
+
+    def _evict_lru(self):
+        """Drop least recently used sessions beyond the memory cap (lock must be held)"""
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _purge_expired(self):
+        """Remove expired sessions from memory and disk (lock must be held)"""
+        cutoff = time.time() - self.ttl_seconds
+        for address in [a for a, s in self._sessions.items() if s.updated_at < cutoff]:
+            del self._sessions[address]
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._db.commit()
+        self._writes_since_purge = 0
+
+    def stats(self):
+        """Return the number of sessions held in memory and on disk"""
+        with self._lock:
+            on_disk = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] if self._db else None
+            return {"in_memory": len(self._sessions), "on_disk": on_disk}
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,111 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Degradation levels, from normal operation to no API calls at all
+FULL = 0
+FEWER_CANDIDATES = 1
+NO_NUTRITION = 2
+CACHE_ONLY = 3
+
+LEVEL_NAMES = {FULL: "full", FEWER_CANDIDATES: "fewer candidates", NO_NUTRITION: "no nutrition", CACHE_ONLY: "cache only"}
+
+# Background work (prefetching, index building) degrades earlier than user requests
+PRIORITY_OFFSETS = {"interactive": 0.0, "background": 0.25}
+
+
+class QuotaTracker:
+    """Tracks Spoonacular points used per day and decides how far to degrade
+
+    Points are read from the X-API-Quota-Request / X-API-Quota-Used response
+    headers and persisted per UTC day (Spoonacular resets its quota at UTC
+    midnight). The fraction of daily_budget used, shifted by the caller's
+    priority, selects a degradation level via thresholds.
+    """
+
+    def __init__(self, daily_budget=150, path="data/spoon_quota.json", thresholds=(0.6, 0.8, 0.95)):
+        self.daily_budget = daily_budget
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self.thresholds = thresholds
+
+        self._lock = threading.Lock()
+        self._state = {"date": self._today(), "used": 0.0, "requests": 0}
+        self._load()
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return
+        if state.get("date") == self._today():
+            self._state = state
+
+    def _save(self):
+        """Persist the counters atomically (lock must be held)"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
+
+    def _roll_over(self):
+        """Start a new day's counters after UTC midnight (lock must be held)"""
+        today = self._today()
+        if self._state["date"] != today:
+            self._state = {"date": today, "used": 0.0, "requests": 0}
+
+    def record(self, response):
+        """Update the counters from a Spoonacular response's quota headers"""
+        headers = getattr(response, "headers", None) or {}
+        try:
+            request_points = float(headers.get("X-API-Quota-Request", 0) or 0)
+            used_points = float(headers["X-API-Quota-Used"]) if headers.get("X-API-Quota-Used") else None
+        except ValueError:
+            return
+
+        with self._lock:
+            self._roll_over()
+            self._state["requests"] += 1
+            self._state["used"] += request_points
+            if used_points is not None:
+                # The server's total is authoritative, e.g. for other clients sharing the key
+                self._state["used"] = max(self._state["used"], used_points)
+            self._save()
+
+    def used_today(self):
+        with self._lock:
+            self._roll_over()
+            return self._state["used"]
+
+    def remaining(self):
+        return max(0.0, self.daily_budget - self.used_today())
+
+    def level(self, priority="interactive"):
+        """Degradation level for a caller of the given priority"""
+        fraction = self.used_today() / self.daily_budget if self.daily_budget else 1.0
+        fraction += PRIORITY_OFFSETS.get(priority, 0.0)
+
+        level = FULL
+        for threshold_level, threshold in enumerate(self.thresholds, start=1):
+            if fraction >= threshold:
+                level = threshold_level
+        if fraction >= 1.0:
+            level = CACHE_ONLY
+        return level
+
+    def report(self):
+        with self._lock:
+            self._roll_over()
+            state = dict(self._state)
+        state["budget"] = self.daily_budget
+        state["level"] = LEVEL_NAMES[self.level()]
+        return state
@@ -0,0 +1,129 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the Spoonacular endpoints used by api_spoon.
+# Start it and point the app at it with SPOONACULAR_BASE_URL=http://localhost:8089
+#
+#   python spoonacular_stub.py --delay 0.3            -> serve on port 8089
+#   python spoonacular_stub.py --delay 0.3 --bench    -> time get_detailed_recipes for 3 and 10 recipes
+
+INGREDIENT_POOL = [
+    "tomato", "cheese", "pasta", "chicken", "rice", "onion", "garlic", "carrot", "potato", "egg",
+    "milk", "butter", "spinach", "beef", "mushroom", "bell pepper", "zucchini", "basil", "olive oil", "lemon",
+]
+
+
+def make_recipe(recipe_id):
+    """Build a deterministic fake detail payload shaped like /recipes/{id}/information"""
+    ingredients = [INGREDIENT_POOL[(recipe_id + offset * 3) % len(INGREDIENT_POOL)] for offset in range(6)]
+    return {
+        "id": recipe_id,
+        "title": f"Stub Recipe {recipe_id}",
+        "image": f"https://img.spoonacular.com/recipes/{recipe_id}-556x370.jpg",
+        "healthScore": (recipe_id * 7) % 100,
+        "sourceUrl": f"https://example.com/recipes/{recipe_id}",
+        "analyzedInstructions": [{"steps": [{"number": n, "step": f"Step {n} for recipe {recipe_id}."} for n in range(1, 6)]}],
+        "extendedIngredients": [{"name": name, "original": f"1 cup {name}"} for name in ingredients],
+        "nutrition": {"nutrients": [{"name": "Calories", "amount": 400 + recipe_id % 300, "unit": "kcal"}]},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    bulk_enabled = True
+    failing_ids = set()
+    points_used = 0.0
+    points_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, points=0.0):
+        body = json.dumps(payload).encode("utf-8")
+        with StubHandler.points_lock:
+            StubHandler.points_used += points
+            used = StubHandler.points_used
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        # Quota headers as sent by Spoonacular
+        self.send_header("X-API-Quota-Request", str(points))
+        self.send_header("X-API-Quota-Used", str(used))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+        time.sleep(self.delay)
+
+        if url.path == "/recipes/findByIngredients":
+            number = int(params.get("number", ["3"])[0])
+            used = params.get("ingredients", [""])[0].split(",")
+            self._send_json([
+                {"id": 1000 + n, "title": f"Stub Recipe {1000 + n}", "image": make_recipe(1000 + n)["image"],
+                 "usedIngredientCount": len(used), "missedIngredientCount": n % 3,
+                 "usedIngredients": [{"name": name} for name in used], "missedIngredients": []}
+                for n in range(number)
+            ], points=1 + 0.01 * number)
+        elif url.path == "/recipes/informationBulk" and self.bulk_enabled:
+            ids = [int(i) for i in params.get("ids", [""])[0].split(",") if i]
+            self._send_json([make_recipe(i) for i in ids if i not in self.failing_ids], points=1 + 0.5 * (len(ids) - 1))
+        elif len(parts) == 3 and parts[0] == "recipes" and parts[2] == "information" and parts[1].isdigit():
+            recipe_id = int(parts[1])
+            if recipe_id in self.failing_ids:
+                self._send_json({"status": "failure", "message": "not found"}, status=404)
+            else:
+                self._send_json(make_recipe(recipe_id), points=1.0)
+        else:
+            self._send_json({"status": "failure", "message": "unknown endpoint"}, status=404)
+
+
+def start_stub(port=8089, delay=0.0, bulk_enabled=True, failing_ids=()):
+    """Start the stub server in a daemon thread and return it"""
+    StubHandler.delay = delay
+    StubHandler.bulk_enabled = bulk_enabled
+    StubHandler.failing_ids = set(failing_ids)
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_benchmark(port):
+    """Time get_detailed_recipes for 3 and 10 candidates against the running stub"""
+    import api_spoon
+    api_spoon.SPOONACULAR_BASE_URL = f"http://127.0.0.1:{port}"
+
+    for number in (3, 10):
+        started = time.perf_counter()
+        recipes, errors = api_spoon.get_detailed_recipes(["tomato", "cheese"], number=number, mit_fehlern=True)
+        elapsed = time.perf_counter() - started
+        print(f"{number:>2} candidates: {len(recipes)} recipes, {len(errors)} errors in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Spoonacular stub server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of latency per request")
+    parser.add_argument("--no-bulk", action="store_true", help="disable /recipes/informationBulk")
+    parser.add_argument("--fail", type=int, nargs="*", default=[], help="recipe ids that return 404")
+    parser.add_argument("--bench", action="store_true", help="run the detail-fetch benchmark and exit")
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.delay, not args.no_bulk, args.fail)
+    if args.bench:
+        run_benchmark(args.port)
+        server.shutdown()
+        sys.exit(0)
+
+    print(f"Spoonacular stub listening on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
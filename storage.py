@@ -0,0 +1,614 @@
+import os
+import re
+import sys
+import time
+import atexit
+import hashlib
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Storage backends for users and their saved recipes, selected with storage_backend=json|sqlite
+#
+#   python storage.py migrate [--source data/data.json] [--target data/data.sqlite3]
+#   python storage.py bench [--sizes 1 5 20 50]   -> JSON load/save latency by file size
+
+
+class JsonDocument:
+    """Process-wide cached copy of one JSON file with write-behind
+
+    Reads are served from memory; before each read the file's mtime and size
+    are compared with the last load or write, so changes by other processes
+    are picked up. Changes mark the document dirty and a timer writes it
+    write_delay seconds later, batching bursts of saves into one rewrite
+    (write_delay=0 writes immediately). Writes go to a temporary file that is
+    renamed over the original, so readers never see a half-written file.
+    While unflushed changes are pending the in-memory copy wins.
+    """
+
+    def __init__(self, path, write_delay=0.5, on_load=None):
+        self.path = Path(path)
+        self.write_delay = write_delay
+        # Called with each freshly parsed document, returns True if it changed it (then written back)
+        self.on_load = on_load
+
+        self.lock = threading.RLock()  # hold while mutating the document returned by read()
+        self._data = None
+        self._stamp = None  # (mtime_ns, size) of the file our copy matches
+        self._dirty = False
+        self._timer = None
+        self.generation = 0  # bumped whenever the content changes, see version()
+        self.modified_at = 0.0
+        self.stats = {"loads": 0, "cached_reads": 0, "writes": 0, "batched_changes": 0}
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self):
+        """Return the cached document; treat it as read-only unless followed by changed()"""
+        with self.lock:
+            if self._dirty:
+                self.stats["cached_reads"] += 1
+                return self._data
+
+            stamp = self._file_stamp()
+            if self._data is not None and stamp == self._stamp:
+                self.stats["cached_reads"] += 1
+                return self._data
+
+            self.stats["loads"] += 1
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except FileNotFoundError:
+                self._data = {"users": {}}
+            except json.JSONDecodeError:
+                print("Error loading JSON data, initializing new data file")
+                self._data = {"users": {}}
+                self._loaded()
+                self._write()
+                self.generation += 1
+                self.modified_at = time.time()
+                return self._data
+            self._stamp = stamp
+            self.generation += 1
+            self.modified_at = stamp[0] / 1e9 if stamp else time.time()
+            self._loaded()
+            return self._data
+
+    def _loaded(self):
+        """Run the on_load hook on a freshly parsed document (lock must be held)"""
+        if self.on_load is not None and self.on_load(self._data):
+            self.changed()
+
+    def version(self):
+        """(version token, modification time) of the content, reloading first if the file changed"""
+        with self.lock:
+            if not self._dirty and (self._data is None or self._file_stamp() != self._stamp):
+                self.read()
+            return f"json-{self.generation}", self.modified_at
+
+    def replace(self, data):
+        with self.lock:
+            self._data = data
+            self.changed()
+
+    def changed(self):
+        """Schedule a write of the (mutated) document"""
+        with self.lock:
+            self._dirty = True
+            self.generation += 1
+            self.modified_at = time.time()
+            self.stats["batched_changes"] += 1
+            if self.write_delay <= 0:
+                self._write()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write pending changes now"""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._write()
+
+    def _write(self):
+        """Atomically replace the file with the document (lock must be held)"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()
+        self._dirty = False
+        self.stats["writes"] += 1
+
+
+# One document per file, shared by the bot's DataManager and the web thread
+_documents = {}
+_documents_lock = threading.Lock()
+
+
+def json_document(path, write_delay=None, on_load=None):
+    path = Path(path).resolve()
+    with _documents_lock:
+        document = _documents.get(path)
+        if document is None:
+            if write_delay is None:
+                write_delay = float(os.environ.get("storage_write_delay", 0.5))
+            document = _documents[path] = JsonDocument(path, write_delay, on_load)
+        elif on_load is not None and document.on_load is None:
+            with document.lock:
+                document.on_load = on_load
+                if document._data is not None:
+                    document._loaded()
+        return document
+
+
+@atexit.register
+def flush_json_documents():
+    """Write pending changes of all JSON documents (also runs at interpreter exit)"""
+    with _documents_lock:
+        documents = list(_documents.values())
+    for document in documents:
+        document.flush()
+
+
+# Spoonacular image URLs start with the recipe id: https://img.spoonacular.com/recipes/632050-556x370.jpg
+SPOONACULAR_IMAGE_ID = re.compile(r"/recipe(?:s|Images)/(\d+)-")
+
+
+def recipe_id(recipe):
+    """Spoonacular id of a recipe; old entries saved without one get it from their image URL, else None"""
+    if recipe.get("id") is not None:
+        return recipe["id"]
+    match = SPOONACULAR_IMAGE_ID.search(recipe.get("bild_url") or "")
+    return int(match.group(1)) if match else None
+
+
+def recipe_key(recipe):
+    """Key of a recipe in the shared recipe table: the Spoonacular id, or a content hash for recipes without one"""
+    if recipe_id(recipe) is not None:
+        return str(recipe_id(recipe))
+    identity = json.dumps([recipe.get("rezeptname"), recipe.get("rezept_url")], ensure_ascii=False)
+    return "h" + hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def _recipe_without_save_time(recipe):
+    """Recipe as stored in the recipe table: without the save time, with the id if it can be derived"""
+    stored = {field: value for field, value in recipe.items() if field != "saved_at"}
+    if stored.get("id") is None and recipe_id(stored) is not None:
+        stored["id"] = recipe_id(stored)
+    return stored
+
+
+def normalize_document(data):
+    """Move full recipe copies in users' saved_recipes into the shared "recipes" table
+
+    Each saved entry becomes a {"recipe_key", "saved_at"} reference and
+    repeated saves of the same recipe by one user collapse into the first.
+    Recipes stored under a content hash whose id can be read from the image
+    URL move to the id key, so saving them again doesn't add a copy.
+    Returns (document, number of entries changed); already normalized
+    documents come back unchanged.
+    """
+    recipes = data.setdefault("recipes", {})
+    changed = 0
+    renamed = {}  # content hash key -> id key
+    for key in [key for key in recipes if key.startswith("h")]:
+        recipe = _recipe_without_save_time(recipes[key])
+        if recipe.get("id") is not None:
+            renamed[key] = str(recipe["id"])
+            recipes.setdefault(renamed[key], recipe)
+            del recipes[key]
+            changed += 1
+
+    for user in data.get("users", {}).values():
+        references, seen = [], set()
+        for entry in user.get("saved_recipes", []):
+            if "recipe_key" in entry:
+                key, saved_at = entry["recipe_key"], entry.get("saved_at")
+                if key in renamed:
+                    key = renamed[key]
+                    changed += 1
+            else:
+                key, saved_at = recipe_key(entry), entry.get("saved_at")
+                recipes[key] = _recipe_without_save_time(entry)
+                changed += 1
+            if key in seen:
+                changed += 1
+                continue
+            seen.add(key)
+            references.append({"recipe_key": key, "saved_at": saved_at})
+        user["saved_recipes"] = references
+    return data, changed
+
+
+def _normalize_loaded(data):
+    """JsonDocument on_load hook of JsonStorage: normalize old files once per (re)load"""
+    _, changed = normalize_document(data)
+    if changed:
+        print(f"Moved {changed} saved recipe copies to the shared recipe table")
+    return changed > 0
+
+
+def _resolve(recipe, saved_at):
+    """Saved recipe in the flat data.json recipe layout"""
+    return dict(recipe, saved_at=saved_at) if saved_at else dict(recipe)
+
+
+class JsonStorage:
+    """All users in one JSON document (data/data.json), fine for small setups
+
+    Recipes are stored once in the document's "recipes" table keyed by
+    recipe_key(); a user's saved_recipes only hold references with the
+    save time. Older files with full copies per user are normalized when
+    the file is (re)loaded, not on every read.
+
+    Backed by the shared, cached JsonDocument of the file: reads don't
+    re-parse the file and saves are written behind in batches.
+    """
+
+    def __init__(self, path="data/data.json", write_delay=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+        self.document = json_document(self.path, write_delay, on_load=_normalize_loaded)
+        if not self.path.exists():
+            self.save_all({"users": {}, "recipes": {}})
+            self.flush()
+
+    def load_all(self):
+        """Return the whole {"users": {...}, "recipes": {...}} document (shared, don't modify it)"""
+        return self.document.read()
+
+    def save_all(self, data):
+        self.document.replace(normalize_document(data)[0])
+
+    def get_user(self, phone_number):
+        user = self.load_all()["users"].get(phone_number)
+        if user is None:
+            return None
+        return dict(user, saved_recipes=self.saved_recipes(phone_number))
+
+    def ensure_user(self, phone_number):
+        """Create the user if needed and return their record"""
+        with self.document.lock:
+            users = self.load_all()["users"]
+            if phone_number not in users:
+                users[phone_number] = {"created_at": datetime.now().isoformat(), "saved_recipes": []}
+                self.document.changed()
+            return self.get_user(phone_number)
+
+    def add_saved_recipe(self, phone_number, recipe):
+        """Save a recipe for a user; returns False if the user had already saved it"""
+        key = recipe_key(recipe)
+        with self.document.lock:
+            data = self.load_all()
+            data["recipes"][key] = _recipe_without_save_time(recipe)
+            user = data["users"].setdefault(phone_number, {"saved_recipes": []})
+            references = user.setdefault("saved_recipes", [])
+            added = not any(entry["recipe_key"] == key for entry in references)
+            if added:
+                references.append({"recipe_key": key, "saved_at": recipe.get("saved_at") or datetime.now().isoformat()})
+            self.document.changed()
+            return added
+
+    def saved_recipes(self, phone_number):
+        with self.document.lock:
+            data = self.load_all()
+            user = data["users"].get(phone_number)
+            if not user:
+                return []
+            recipes = data["recipes"]
+            return [
+                _resolve(recipes[entry["recipe_key"]], entry.get("saved_at"))
+                for entry in user.get("saved_recipes", []) if entry["recipe_key"] in recipes
+            ]
+
+    def get_recipe(self, key):
+        """Stored recipe with this recipe_key(), or None"""
+        with self.document.lock:
+            return self.load_all()["recipes"].get(key)
+
+    def version(self):
+        """(version token, modification time) of the stored data, changes with every save"""
+        return self.document.version()
+
+    def flush(self):
+        self.document.flush()
+
+
+class SqliteStorage:
+    """Users and saved recipes in SQLite (WAL)
+
+    Each recipe is stored once in the recipes table (keyed by recipe_key(),
+    JSON in the data.json recipe layout); user_recipes references it per
+    user with the save time and is indexed by phone number and saved_at.
+    Saving is an upsert of the recipe plus an INSERT OR IGNORE of the
+    reference in one transaction, so repeated saves are no-ops.
+    """
+
+    def __init__(self, path="data/data.sqlite3"):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS users (phone TEXT PRIMARY KEY, created_at TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS recipes (recipe_key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_recipes ("
+            "phone TEXT NOT NULL, recipe_key TEXT NOT NULL REFERENCES recipes (recipe_key), saved_at TEXT NOT NULL, "
+            "PRIMARY KEY (phone, recipe_key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS user_recipes_phone_saved_at ON user_recipes (phone, saved_at)")
+        self._db.commit()
+
+        # See version(): local writes bump the generation, PRAGMA data_version reveals other connections' writes
+        self._generation = 0
+        self._modified_at = os.path.getmtime(self.path)
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        self._migrate_copied_recipes()
+        self._rekey_hashed_recipes()
+
+    def _migrate_copied_recipes(self):
+        """Deduplicate the per-user recipe copies of the old saved_recipes table into recipes/user_recipes"""
+        with self._lock:
+            legacy = self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'saved_recipes'").fetchone()
+            if not legacy:
+                return
+            rows = self._db.execute("SELECT phone, saved_at, data FROM saved_recipes ORDER BY saved_at, id").fetchall()
+            with self._db:
+                for phone, saved_at, data in rows:
+                    self._save_reference(phone, json.loads(data), saved_at)
+                self._db.execute("DROP TABLE saved_recipes")
+            unique = self._db.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+        print(f"Migrated {len(rows)} saved recipe copies to {unique} shared recipes")
+
+    def _rekey_hashed_recipes(self):
+        """Move recipes stored under a content hash to their id key where the image URL gives one"""
+        with self._lock:
+            rows = self._db.execute("SELECT recipe_key, data FROM recipes WHERE recipe_key LIKE 'h%'").fetchall()
+            renamed = [(key, _recipe_without_save_time(json.loads(data))) for key, data in rows]
+            renamed = [(key, recipe) for key, recipe in renamed if recipe.get("id") is not None]
+            if not renamed:
+                return
+            with self._db:
+                self._touch()
+                for key, recipe in renamed:
+                    new_key = str(recipe["id"])
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO recipes (recipe_key, data) VALUES (?, ?)",
+                        (new_key, json.dumps(recipe, ensure_ascii=False))
+                    )
+                    # A user who saved the recipe again under its id keeps the earlier save
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO user_recipes (phone, recipe_key, saved_at) "
+                        "SELECT u.phone, ?, MIN(u.saved_at, COALESCE(n.saved_at, u.saved_at)) FROM user_recipes u "
+                        "LEFT JOIN user_recipes n ON n.phone = u.phone AND n.recipe_key = ? WHERE u.recipe_key = ?",
+                        (new_key, new_key, key)
+                    )
+                    self._db.execute("DELETE FROM user_recipes WHERE recipe_key = ?", (key,))
+                    self._db.execute("DELETE FROM recipes WHERE recipe_key = ?", (key,))
+        print(f"Moved {len(renamed)} recipe(s) from content hash keys to their Spoonacular id")
+
+    def _touch(self):
+        """Record a local write (lock must be held)"""
+        self._generation += 1
+        self._modified_at = time.time()
+
+    def version(self):
+        """(version token, modification time) of the stored data, changes with every save"""
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._touch()
+            return f"sqlite-{self._generation}", self._modified_at
+
+    def _save_reference(self, phone_number, recipe, saved_at):
+        """Upsert the recipe and add the user's reference unless present (lock and transaction must be held)"""
+        self._touch()
+        key = recipe_key(recipe)
+        self._db.execute(
+            "INSERT OR REPLACE INTO recipes (recipe_key, data) VALUES (?, ?)",
+            (key, json.dumps(_recipe_without_save_time(recipe), ensure_ascii=False))
+        )
+        return self._db.execute(
+            "INSERT OR IGNORE INTO user_recipes (phone, recipe_key, saved_at) VALUES (?, ?, ?)",
+            (phone_number, key, saved_at or datetime.now().isoformat())
+        ).rowcount == 1
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+
+    def load_all(self):
+        """Return everything in the (normalized) data.json layout"""
+        with self._lock:
+            users = self._db.execute("SELECT phone, created_at FROM users").fetchall()
+            references = self._db.execute("SELECT phone, recipe_key, saved_at FROM user_recipes ORDER BY saved_at").fetchall()
+            recipes = self._db.execute("SELECT recipe_key, data FROM recipes").fetchall()
+
+        data = {"users": {}, "recipes": {key: json.loads(recipe) for key, recipe in recipes}}
+        for phone, created_at in users:
+            data["users"][phone] = {"created_at": created_at, "saved_recipes": []} if created_at else {"saved_recipes": []}
+        for phone, key, saved_at in references:
+            data["users"].setdefault(phone, {"saved_recipes": []})["saved_recipes"].append({"recipe_key": key, "saved_at": saved_at})
+        return data
+
+    def save_all(self, data):
+        """Replace everything with a data.json-style document (migration and compatibility)"""
+        data, _ = normalize_document(data)
+        users = [(phone, user.get("created_at")) for phone, user in data.get("users", {}).items()]
+        recipes = [(key, json.dumps(recipe, ensure_ascii=False)) for key, recipe in data["recipes"].items()]
+        references = [
+            (phone, entry["recipe_key"], entry.get("saved_at") or "")
+            for phone, user in data.get("users", {}).items() for entry in user.get("saved_recipes", [])
+        ]
+
+        with self._lock, self._db:
+            self._touch()
+            self._db.execute("DELETE FROM user_recipes")
+            self._db.execute("DELETE FROM recipes")
+            self._db.execute("DELETE FROM users")
+            self._db.executemany("INSERT INTO users (phone, created_at) VALUES (?, ?)", users)
+            self._db.executemany("INSERT INTO recipes (recipe_key, data) VALUES (?, ?)", recipes)
+            self._db.executemany("INSERT OR IGNORE INTO user_recipes (phone, recipe_key, saved_at) VALUES (?, ?, ?)", references)
+
+    def get_user(self, phone_number):
+        with self._lock:
+            row = self._db.execute("SELECT created_at FROM users WHERE phone = ?", (phone_number,)).fetchone()
+        if row is None:
+            return None
+        user = {"created_at": row[0]} if row[0] else {}
+        user["saved_recipes"] = self.saved_recipes(phone_number)
+        return user
+
+    def ensure_user(self, phone_number):
+        with self._lock, self._db:
+            self._touch()
+            self._db.execute(
+                "INSERT OR IGNORE INTO users (phone, created_at) VALUES (?, ?)",
+                (phone_number, datetime.now().isoformat())
+            )
+        return self.get_user(phone_number)
+
+    def add_saved_recipe(self, phone_number, recipe):
+        """Save a recipe for a user; returns False if the user had already saved it"""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO users (phone, created_at) VALUES (?, NULL)", (phone_number,))
+            return self._save_reference(phone_number, recipe, recipe.get("saved_at"))
+
+    def saved_recipes(self, phone_number):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT r.data, u.saved_at FROM user_recipes u JOIN recipes r ON r.recipe_key = u.recipe_key "
+                "WHERE u.phone = ? ORDER BY u.saved_at", (phone_number,)
+            ).fetchall()
+        return [_resolve(json.loads(data), saved_at) for data, saved_at in rows]
+
+    def get_recipe(self, key):
+        """Stored recipe with this recipe_key(), or None"""
+        with self._lock:
+            row = self._db.execute("SELECT data FROM recipes WHERE recipe_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def flush(self):
+        # Every change is committed immediately
+        pass
+
+
+def migrate_json_to_sqlite(source="data/data.json", target="data/data.sqlite3"):
+    """Copy a data.json document into a SQLite store, returns (users, unique recipes) copied"""
+    data = JsonStorage(source).load_all()
+    SqliteStorage(target).save_all(data)
+    return len(data.get("users", {})), len(data.get("recipes", {}))
+
+
+def open_storage(backend=None, data_dir="data"):
+    """Storage for storage_backend ("json" by default)
+
+    The first time the SQLite backend is opened next to an existing
+    data.json, that file is migrated into it (and left in place).
+    """
+    backend = (backend or os.environ.get("storage_backend", "json")).lower()
+    data_dir = Path(data_dir)
+    if backend == "json":
+        return JsonStorage(data_dir / "data.json")
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    storage = SqliteStorage(data_dir / "data.sqlite3")
+    json_path = data_dir / "data.json"
+    if storage.is_empty() and json_path.exists():
+        storage.save_all(JsonStorage(json_path).load_all())
+        print(f"Migrated {json_path} to {storage.path}")
+    return storage
+
+
+def _bench_document(path, size_mb):
+    """Write a data.json of roughly size_mb megabytes"""
+    recipe = {
+        "rezeptname": "Benchmark Recipe", "bild_url": "https://img.spoonacular.com/recipes/1-556x370.jpg",
+        "gesundheitsbewertung": 50, "rezept_url": "https://example.com/recipe", "video_url": "",
+        "zubereitung": [f"Step {n} of the benchmark recipe." for n in range(8)],
+        "zutaten": [f"1 cup ingredient {n}" for n in range(10)], "saved_at": datetime.now().isoformat(),
+    }
+    per_recipe = len(json.dumps(recipe, indent=2))
+    count = int(size_mb * 1024 * 1024 / per_recipe)
+    users = {f"whatsapp:+49{n:09d}": {"created_at": recipe["saved_at"], "saved_recipes": []} for n in range(max(1, count // 20))}
+    phones = list(users)
+    for n in range(count):
+        users[phones[n % len(phones)]]["saved_recipes"].append(dict(recipe, id=n))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"users": users}, f, indent=2)
+    return phones[0], recipe
+
+
+def run_benchmark(sizes, saves=50, directory="data/bench"):
+    """Compare parsing the file on every call with the cached, write-behind document"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for size_mb in sizes:
+        path = directory / f"data_{size_mb}mb.json"
+        phone, recipe = _bench_document(path, size_mb)
+
+        started = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        parse_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        rewrite_ms = (time.perf_counter() - started) * 1000
+
+        storage = JsonStorage(path, write_delay=0.5)
+        storage.load_all()
+        started = time.perf_counter()
+        for _ in range(saves):
+            storage.saved_recipes(phone)
+        cached_ms = (time.perf_counter() - started) * 1000 / saves
+        started = time.perf_counter()
+        for _ in range(saves):
+            storage.add_saved_recipe(phone, recipe)
+        save_ms = (time.perf_counter() - started) * 1000 / saves
+        started = time.perf_counter()
+        storage.flush()
+        flush_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{os.path.getsize(path) / 1024 / 1024:6.1f} MB  uncached load {parse_ms:8.1f} ms  save {parse_ms + rewrite_ms:8.1f} ms"
+              f"  |  cached load {cached_ms:6.3f} ms  save {save_ms:6.3f} ms  flush of {saves} saves {flush_ms:8.1f} ms")
+        path.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NutriScan storage tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="copy data.json into the SQLite backend")
+    migrate.add_argument("--source", default="data/data.json")
+    migrate.add_argument("--target", default="data/data.sqlite3")
+    bench = commands.add_parser("bench", help="time JSON load/save as the file grows")
+    bench.add_argument("--sizes", type=float, nargs="+", default=[1, 5, 20, 50], help="file sizes in MB")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        run_benchmark(args.sizes)
+        sys.exit(0)
+
+    if not Path(args.source).exists():
+        sys.exit(f"{args.source} not found")
+    users, recipes = migrate_json_to_sqlite(args.source, args.target)
+    print(f"Migrated {users} users and {recipes} unique recipes to {args.target}")
@@ -0,0 +1,75 @@
+import pytest
+
+import api_spoon
+from recipe_cache import RecipeCache
+from search_cache import SearchCache
+from spoon_quota import QuotaTracker
+from spoonacular_stub import StubHandler, start_stub
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = start_stub(port=0)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def calls(stub, tmp_path, monkeypatch):
+    """Point api_spoon at the stub with empty caches; returns the paths of the requests it makes"""
+    monkeypatch.setattr(api_spoon, "SPOONACULAR_BASE_URL", stub)
+    monkeypatch.setattr(api_spoon, "recipe_cache", RecipeCache(path=tmp_path / "recipe_cache.sqlite3"))
+    monkeypatch.setattr(api_spoon, "search_cache", SearchCache())
+    monkeypatch.setattr(api_spoon, "quota", QuotaTracker(daily_budget=1000, path=tmp_path / "spoon_quota.json"))
+    monkeypatch.setattr(api_spoon, "local_index", None)
+    monkeypatch.setattr(StubHandler, "bulk_enabled", True)
+    monkeypatch.setattr(StubHandler, "failing_ids", set())
+
+    paths = []
+    spoonacular_get = api_spoon._spoonacular_get
+
+    def recording_get(url, params):
+        paths.append(url[len(stub):])
+        return spoonacular_get(url, params)
+
+    monkeypatch.setattr(api_spoon, "_spoonacular_get", recording_get)
+    return paths
+
+
+def test_details_come_from_one_bulk_call_in_the_order_of_the_ids(calls):
+    recipes, errors = api_spoon.get_recipe_details([1003, 1001, 1002])
+
+    assert [recipe.id for recipe in recipes] == [1003, 1001, 1002]
+    assert errors == []
+    assert calls == ["/recipes/informationBulk"]
+
+
+def test_without_bulk_endpoint_recipes_are_fetched_one_by_one(calls, monkeypatch):
+    monkeypatch.setattr(StubHandler, "bulk_enabled", False)
+
+    recipes, errors = api_spoon.get_recipe_details([1003, 1001, 1002])
+
+    assert [recipe.id for recipe in recipes] == [1003, 1001, 1002]
+    assert errors == []
+    assert calls[0] == "/recipes/informationBulk"
+    assert sorted(calls[1:]) == [f"/recipes/{recipe_id}/information" for recipe_id in (1001, 1002, 1003)]
+
+
+def test_recipes_missing_from_bulk_are_reported_as_errors(calls, monkeypatch):
+    monkeypatch.setattr(StubHandler, "failing_ids", {1001})
+
+    recipes, errors = api_spoon.get_detailed_recipes(["tomato", "cheese"], number=3, mit_fehlern=True)
+
+    assert [recipe.id for recipe in recipes] == [1000, 1002]
+    assert errors == [{"id": 1001, "fehler": "HTTP 404"}]
+    assert calls == ["/recipes/findByIngredients", "/recipes/informationBulk", "/recipes/1001/information"]
+
+
+def test_cached_details_cost_no_request(calls):
+    api_spoon.get_recipe_details([1001, 1002])
+    del calls[:]
+
+    recipes, errors = api_spoon.get_recipe_details([1002, 1001])
+
+    assert [recipe.id for recipe in recipes] == [1002, 1001]
+    assert calls == []
@@ -0,0 +1,40 @@
+from recipe_index import RecipeIndex, recipe_summary
+
+
+def tiny_index():
+    return RecipeIndex.build([
+        (1, "Caprese", "", ["tomato", "mozzarella cheese", "basil"]),
+        (2, "Pasta bake", "", ["cherry tomatoes", "cheddar cheese", "pasta", "garlic", "onion"]),
+        (3, "Tomato salad", "", ["tomato", "salt"]),
+        (4, "Pancakes", "", ["flour", "milk", "egg"]),
+    ])
+
+
+def test_ranking_1_prefers_used_ingredients():
+    results = tiny_index().search(["tomatoes", "cheese"], number=3, ranking=1)
+
+    assert [result["id"] for result in results] == [1, 2, 3]
+    assert [(result["usedIngredientCount"], result["missedIngredientCount"]) for result in results] == [(2, 1), (2, 3), (1, 0)]
+    assert [item["name"] for item in results[0]["missedIngredients"]] == ["basil"]
+
+
+def test_ranking_2_prefers_fewer_missing_ingredients():
+    results = tiny_index().search(["tomatoes", "cheese"], number=3, ranking=2)
+
+    assert [result["id"] for result in results] == [3, 1, 2]
+
+
+def test_recipes_without_a_used_ingredient_are_not_returned():
+    assert [result["id"] for result in tiny_index().search(["egg"], number=3)] == [4]
+
+
+def test_save_and_load_keep_the_results(tmp_path):
+    path = tmp_path / "recipe_index.npz"
+    tiny_index().save(path)
+
+    assert RecipeIndex.load(path).search(["tomato"], number=3) == tiny_index().search(["tomato"], number=3)
+
+
+def test_saved_recipes_without_ingredient_names_are_skipped():
+    assert recipe_summary({"id": 5, "rezeptname": "Old", "zutaten": ["2 cloves garlic, minced"]}) is None
+    assert recipe_summary({"id": 5, "rezeptname": "New", "bild_url": "", "zutaten_namen": ["garlic"]}) == (5, "New", "", ["garlic"])
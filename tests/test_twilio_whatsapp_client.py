@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import pytest
+
+import twilio_whatsapp_client
+from message_store import ProcessedMessageStore
+
+
+class FakeConversations:
+    """The part of the Twilio Conversations client the bot's polling uses"""
+
+    def __init__(self):
+        self.messages = {}
+
+    def add(self, conversation_sid, index):
+        message = SimpleNamespace(sid=f"IM{index}", index=index, author="whatsapp:+1", body=f"message {index}",
+                                  media=None, conversation_sid=conversation_sid)
+        self.messages.setdefault(conversation_sid, []).append(message)
+        return message
+
+    def services(self, service_sid):
+        return SimpleNamespace(conversations=lambda conversation_sid: SimpleNamespace(
+            messages=SimpleNamespace(page=lambda order, page_size: FakePage(
+                sorted(self.messages.get(conversation_sid, []), key=lambda m: -m.index), page_size))))
+
+
+class FakePage:
+    def __init__(self, messages, size, offset=0):
+        self.messages, self.size, self.offset = messages, size, offset
+
+    def __iter__(self):
+        return iter(self.messages[self.offset:self.offset + self.size])
+
+    def next_page(self):
+        if self.offset + self.size >= len(self.messages):
+            return None
+        return FakePage(self.messages, self.size, self.offset + self.size)
+
+
+@pytest.fixture
+def conversations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name in ("api_key_sid", "api_key_secret", "account_sid", "conversation_service_id", "your_whatsapp", "twilio_whatsapp"):
+        monkeypatch.setenv(name, "x")
+    fake = FakeConversations()
+    monkeypatch.setattr(twilio_whatsapp_client, "Client", lambda *args: SimpleNamespace(conversations=SimpleNamespace(v1=fake)))
+    return fake
+
+
+def start_bot(answered, window_seconds=3600):
+    bot = twilio_whatsapp_client.WhatsAppBot(
+        message_callback=lambda message: answered.append(message.sid),
+        message_store=ProcessedMessageStore("processed.jsonl", window_seconds=window_seconds)
+    )
+    bot.conversation = SimpleNamespace(sid="CH1")
+    bot.active_conversations.add("CH1")
+    bot.conversation_index.conversations = lambda prefix="whatsapp:": set()
+    return bot
+
+
+def webhook_event(message):
+    return {"EventType": "onMessageAdded", "MessageSid": message.sid, "Index": str(message.index),
+            "Author": message.author, "Body": message.body, "ConversationSid": message.conversation_sid}
+
+
+def test_an_empty_injected_store_is_used(conversations):
+    store = ProcessedMessageStore("processed.jsonl")
+    bot = twilio_whatsapp_client.WhatsAppBot(message_store=store)
+
+    assert bot.message_store is store
+
+
+def test_webhook_messages_are_not_answered_again_after_a_restart(conversations):
+    for index in range(3):
+        conversations.add("CH1", index)
+    answered = []
+    bot = start_bot(answered)
+    bot.bootstrap_history()
+    for index in range(3, 10):
+        bot.handle_webhook_event(webhook_event(conversations.add("CH1", index)))
+    bot.process_recent_messages()
+
+    assert answered == [f"IM{index}" for index in range(3, 10)]
+    assert bot.message_store.cursors() == {"CH1": 9}
+
+    # The SIDs have left the time window, only the stored cursor remains
+    answered_after_restart = []
+    start_bot(answered_after_restart, window_seconds=0).process_recent_messages()
+    assert answered_after_restart == []
+
+
+def test_a_message_whose_webhook_was_lost_is_found_by_the_poll(conversations):
+    conversations.add("CH1", 0)
+    answered = []
+    bot = start_bot(answered)
+    bot.bootstrap_history()
+    conversations.add("CH1", 1)
+    bot.handle_webhook_event(webhook_event(conversations.add("CH1", 2)))
+    bot.process_recent_messages()
+    bot.process_recent_messages()
+
+    assert answered == ["IM2", "IM1"]
+    assert bot.message_store.cursors() == {"CH1": 2}
+    assert bot.message_cursors == {"CH1": 2}
@@ -0,0 +1,183 @@
+import io
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+import http_client
+
+# Widths offered by /img/<recipe_id>?w=..., the cards use 320 and 640 for high-DPI screens
+THUMBNAIL_WIDTHS = (320, 640)
+CHUNK_SIZE = 64 * 1024
+
+
+def source_version(url):
+    """Short hash of an image URL, part of the file name and of the thumbnail URL (?v=)"""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:10]
+
+
+def make_thumbnails(image_bytes, widths=THUMBNAIL_WIDTHS, quality=75):
+    """WebP thumbnails {width: bytes} of an image, scaled to each width but never enlarged"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        largest = max(widths)
+        if image.width > largest:
+            # JPEG: let the decoder scale down by 1/2..1/8 while reading, far cheaper than a full decode
+            image.draft("RGB", (largest, largest * image.height // image.width))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+        thumbnails = {}
+        for width in widths:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, width * 4), Image.LANCZOS)
+            output = io.BytesIO()
+            thumbnail.save(output, format="WEBP", quality=quality, method=4)
+            thumbnails[width] = output.getvalue()
+        return thumbnails
+
+
+class ThumbnailCache:
+    """Disk cache of WebP thumbnails of recipe images for the web interface
+
+    The first request for a recipe downloads its image once and renders all
+    THUMBNAIL_WIDTHS in a background thread pool; concurrent requests for
+    the same image share that job. Files are named after the recipe key, a
+    hash of the source URL (so a changed image gets new thumbnails) and the
+    width. When the cache grows past quota_bytes the least recently served
+    files (by access time, set on every hit) are deleted until it is at 90%
+    of the quota. Images that could not be fetched are not retried for
+    failure_ttl seconds.
+    """
+
+    def __init__(self, root="data/thumbnails", quota_bytes=100 * 1024 * 1024, max_source_bytes=10 * 1024 * 1024,
+                 workers=2, widths=THUMBNAIL_WIDTHS, failure_ttl=300):
+        # Absolute, Flask's send_file resolves relative paths against the app directory
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self.max_source_bytes = max_source_bytes
+        self.widths = widths
+        self.failure_ttl = failure_ttl
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        self._in_flight = {}  # (key, url hash) -> Future
+        self._failed = {}  # (key, url hash) -> time of the failure
+        self._total_bytes = sum(path.stat().st_size for path in self.root.glob("*.webp"))
+        self.stats = {"hits": 0, "generated": 0, "fetched_bytes": 0, "written_bytes": 0, "failed": 0, "evicted": 0}
+
+    def _path(self, key, url_hash, width):
+        return self.root / f"{key}-{url_hash}-{width}.webp"
+
+    def get(self, key, url, width, timeout=10):
+        """Path of the thumbnail of url at width, generated if needed; None if not available
+
+        key must be safe as part of a file name (recipe keys are).
+        """
+        url_hash = source_version(url)
+        path = self._path(key, url_hash, width)
+        try:
+            # Recency goes into the access time; the mtime stays, send_file derives ETag and Last-Modified from it
+            os.utime(path, (time.time(), path.stat().st_mtime))
+            with self._lock:
+                self.stats["hits"] += 1
+            return path
+        except FileNotFoundError:
+            pass
+
+        job = (key, url_hash)
+        with self._lock:
+            failed_at = self._failed.get(job)
+            if failed_at is not None and time.time() - failed_at < self.failure_ttl:
+                return None
+            future = self._in_flight.get(job)
+            if future is None:
+                future = self._in_flight[job] = self._executor.submit(self._generate, key, url_hash, url)
+
+        try:
+            future.result(timeout=timeout)
+        except TimeoutError:
+            print(f"Timed out waiting for the thumbnail of recipe {key}")
+            return None
+        return path if path.exists() else None
+
+    def _download(self, url):
+        response = http_client.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if not content_type.startswith("image/"):
+                raise ValueError(f"not an image: {content_type or 'unknown content type'}")
+            data = bytearray()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                data += chunk
+                if len(data) > self.max_source_bytes:
+                    raise ValueError(f"image exceeds the {self.max_source_bytes} byte limit")
+            return bytes(data)
+        finally:
+            response.close()
+
+    def _generate(self, key, url_hash, url):
+        job = (key, url_hash)
+        try:
+            image_bytes = self._download(url)
+            thumbnails = make_thumbnails(image_bytes, self.widths)
+            written = 0
+            for width, data in thumbnails.items():
+                path = self._path(key, url_hash, width)
+                tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                written += len(data)
+
+            with self._lock:
+                self._total_bytes += written
+                self.stats["generated"] += 1
+                self.stats["fetched_bytes"] += len(image_bytes)
+                self.stats["written_bytes"] += written
+                over_quota = self._total_bytes > self.quota_bytes
+            if over_quota:
+                self._evict()
+        except Exception as e:
+            print(f"Error creating thumbnails for recipe {key}: {e}")
+            with self._lock:
+                self._failed[job] = time.time()
+                self.stats["failed"] += 1
+        finally:
+            with self._lock:
+                self._in_flight.pop(job, None)
+
+    def _evict(self):
+        """Delete the least recently served thumbnails until the cache is at 90% of the quota"""
+        files = []
+        for path in self.root.glob("*.webp"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.quota_bytes * 0.9
+        evicted = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._total_bytes = total
+            self.stats["evicted"] += evicted
+        print(f"Thumbnail cache: evicted {evicted} file(s), {total / 1024 / 1024:.1f} MB left")
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, bytes=self._total_bytes, in_flight=len(self._in_flight))
@@ -1,12 +1,19 @@
 import os
+import json
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
 from twilio.rest import Client
 from dotenv import load_dotenv
+from message_store import ProcessedMessageStore
+from conversation_index import ConversationIndex
+from outbound_queue import OutboundMessageQueue
 
 load_dotenv()
 
 class WhatsAppBot:
-    def __init__(self, message_callback=None):
+    def __init__(self, message_callback=None, message_store=None, worker_pool=None):
         # Load environment variables
         self.api_key = os.environ["api_key_sid"]
         self.api_secret = os.environ["api_key_secret"]
@@ -18,53 +25,65 @@ class WhatsAppBot:
         
         # Initialize conversation
         self.conversation = None
-        self.last_processed_messages = set()  # Track messages by SID
         self.your_whatsapp = os.environ["your_whatsapp"]
         self.twilio_whatsapp = os.environ["twilio_whatsapp"]
         
+        # Processed SIDs survive restarts, messages currently being handled are tracked in memory
+        self.message_store = message_store if message_store is not None else ProcessedMessageStore()
+        self.last_processed_messages = set()  # In-flight message SIDs
+        self._processed_lock = threading.Lock()  # Webhook and polling threads share the SID set
+        
+        # Incremental polling: per conversation the index up to which every listed
+        # message is processed, resuming from the stored one after a restart
+        self.message_cursors = self.message_store.cursors()
+        self.cursor_page_size = 10
+        self.detail_fetch_workers = 5
+        self.poll_stats = {"cycles": 0, "api_calls": 0, "last_cycle_api_calls": 0}
+        
+        # Address -> conversation SID index and the conversations this process serves
+        self.conversation_index = ConversationIndex(self.client, self.service_sid)
+        self.active_conversations = set()
+        
         # Store the callback function
         self.message_callback = message_callback
+        
+        # Optional ConversationWorkerPool - without one, messages are handled inline
+        self.worker_pool = worker_pool
+        
+        # Outgoing messages are sent in the background, rate limited per conversation
+        self.outbound = OutboundMessageQueue(
+            self._deliver_message,
+            min_interval=float(os.environ.get("send_min_interval", 1.0))
+        )
     
     def setup_conversation(self):
-        """Sets up the conversation - finds existing or creates new one"""
-        # Check for existing conversations
-        conversations = self.client.conversations.v1.services(self.service_sid).conversations.list(limit=50)
-        
+        """Sets up the conversation - looks it up in the conversation index or creates a new one"""
         print("Checking for existing conversations...")
-        for conv in conversations:
-            print(f"Found conversation: {conv.sid} - {conv.friendly_name}")
-            
-            # Check if this conversation has the user's WhatsApp number as a participant
-            participants = self.client.conversations.v1.services(self.service_sid).conversations(
-                conv.sid
-            ).participants.list()
-            
-            for participant in participants:
-                # Check if this participant's address matches your WhatsApp number
-                if (hasattr(participant, 'messaging_binding') and 
-                    participant.messaging_binding.get('address') == self.your_whatsapp):
-                    print(f"Found conversation with your WhatsApp number: {conv.sid}")
-                    self.conversation = conv
-                    break
-            
-            # If we found our conversation, break out of the outer loop too
-            if self.conversation:
-                break
+        services = self.client.conversations.v1.services(self.service_sid)
+        
+        # Common case: one index lookup plus one fetch instead of a scan over all conversations
+        conversation_sid = self.conversation_index.find(self.your_whatsapp)
+        if conversation_sid:
+            try:
+                self.conversation = services.conversations(conversation_sid).fetch()
+                print(f"Found conversation with your WhatsApp number: {conversation_sid}")
+            except Exception as e:
+                print(f"Indexed conversation {conversation_sid} is no longer available: {e}")
+                self.conversation_index.remove(self.your_whatsapp)
 
         # If no conversations exist, create a new one
         if not self.conversation:
             print("No existing conversations found. Creating a new one...")
-            self.conversation = self.client.conversations.v1.services(self.service_sid).conversations.create(
+            self.conversation = services.conversations.create(
                 friendly_name="WhatsApp Test Conversation"
             )
             
             print(f"Created new conversation with SID: {self.conversation.sid}")
+            self.conversation_index.set(self.your_whatsapp, self.conversation.sid)
             
             # Add yourself as a WhatsApp participant to the new conversation
             try:
-                participant = self.client.conversations.v1.services(self.service_sid).conversations(
-                    self.conversation.sid
-                ).participants.create(
+                participant = services.conversations(self.conversation.sid).participants.create(
                     messaging_binding_address=self.your_whatsapp,  # Your WhatsApp number
                     messaging_binding_proxy_address=self.twilio_whatsapp  # The hackathon WhatsApp number
                 )
@@ -81,74 +100,339 @@ class WhatsAppBot:
         else:
             print(f"Using existing conversation with SID: {self.conversation.sid}")
         
+        self.active_conversations.add(self.conversation.sid)
+        self.seed_active_conversations()
+        
+        # Keep the index fresh for other addresses without delaying startup
+        if self.conversation_index.needs_rebuild():
+            self.conversation_index.rebuild_in_background()
+        
         return self.conversation
     
-    def send_message(self, message_body):
-        """Sends a message to the conversation"""
-        if not self.conversation:
+    def send_message(self, message_body, conversation_sid=None, status=False):
+        """Queues a message for the given conversation (defaults to the bot's own conversation)
+
+        Returns a Future that resolves to the sent message SID, so callers can wait
+        for delivery when they need to. Status messages (status=True) are dropped
+        if a newer message for the conversation is queued before they went out.
+        """
+        if not conversation_sid and not self.conversation:
             print("No conversation available. Run setup_conversation() first.")
-            return False
+            failed = Future()
+            failed.set_exception(RuntimeError("No conversation available"))
+            return failed
         
+        return self.outbound.enqueue(conversation_sid or self.conversation.sid, message_body, status=status)
+
+    def _deliver_message(self, conversation_sid, message_body):
+        """Send a message right away, raising on errors (used by the outbound queue)"""
         try:
             message = self.client.conversations.v1.services(self.service_sid).conversations(
-                self.conversation.sid
+                conversation_sid
             ).messages.create(
                 body=message_body
             )
-            print(f"Message sent! Message SID: {message.sid}")
-            return True
         except Exception as e:
             print(f"Error sending message: {e}")
-            print("Make sure you've already sent a message from your WhatsApp first.")
-            return False
+            raise
+        print(f"Message sent! Message SID: {message.sid}")
+        return message.sid
     
     def clear_message_history(self):
         """Clears the tracked message history to force reprocessing of messages"""
         self.last_processed_messages.clear()
+        self.message_cursors.clear()
+        self.message_store.clear()
         print("Message history cleared. All messages will be reprocessed.")
 
+    def seed_active_conversations(self):
+        """Poll every conversation the bot serves, not just the owner's
+
+        Conversations with a stored cursor (processed before a restart)
+        resume from it. Conversations only known from the address index,
+        e.g. found by a rebuild, have their history marked as handled first,
+        like bootstrap_history, so old messages aren't answered.
+        """
+        stored = self.message_store.cursors()
+        indexed = self.conversation_index.conversations()
+        with self._processed_lock:
+            new_sids = (set(stored) | indexed) - self.active_conversations
+        
+        for conversation_sid in new_sids - set(stored):
+            try:
+                self._mark_history_processed(conversation_sid, limit=1)
+            except Exception as e:
+                # Left out for now, the next poll cycle tries again
+                print(f"Error reading the history of {conversation_sid}: {e}")
+                new_sids.discard(conversation_sid)
+        
+        with self._processed_lock:
+            self.active_conversations |= new_sids
+        if new_sids:
+            print(f"Polling {len(new_sids)} more conversation(s), {len(self.active_conversations)} in total")
+        return new_sids
+
     def process_recent_messages(self, limit=20, process_all=False):
-        """Manually process the most recent messages"""
-        if not self.conversation:
+        """Process messages added since the last poll in all active conversations, oldest first"""
+        if not self.active_conversations:
             print("No conversation available. Run setup_conversation() first.")
             return []
         
-        print(f"Fetching {limit} most recent messages...")
+        # Picks up conversations a background index rebuild found since the last cycle
+        self.seed_active_conversations()
         
-        # Get latest messages, ordered by date (newest first)
-        messages = self.client.conversations.v1.services(self.service_sid).conversations(
-            self.conversation.sid
-        ).messages.list(limit=limit, order='desc')
+        self.poll_stats["last_cycle_api_calls"] = 0
+        self.poll_stats["cycles"] += 1
+        
+        with self._processed_lock:
+            conversation_sids = list(self.active_conversations)
+        
+        processed_messages = []
+        for conversation_sid in conversation_sids:
+            try:
+                processed_messages += self._process_conversation(conversation_sid, limit, process_all)
+            except Exception as e:
+                # One closed or deleted conversation must not stop the others from being polled
+                print(f"Error polling conversation {conversation_sid}: {e}")
+        
+        self._report_poll_cycle()
+        if not processed_messages:
+            print("No new messages to process.")
+        return processed_messages
+
+    def _process_conversation(self, conversation_sid, limit, process_all):
+        """Process the new messages of a single conversation"""
+        # Without a cursor (first run or forced reprocessing) fall back to the last 'limit' messages
+        cursor = None if process_all else self.message_cursors.get(conversation_sid)
+        if cursor is None:
+            print(f"Fetching {limit} most recent messages of {conversation_sid}...")
+        messages = self._list_messages_after(conversation_sid, cursor, limit)
         
         # Determine which messages to process
         messages_to_process = []
+        settled_index = None  # Highest index of the leading run of messages that are already stored
+        settled = True
         for message in messages:
-            if process_all or message.sid not in self.last_processed_messages:
+            if self._claim_message(message.sid) or process_all:
                 messages_to_process.append(message)
-                self.last_processed_messages.add(message.sid)
+                settled = False
+            elif settled and self.message_store.contains(message.sid):
+                settled_index = message.index
+            else:
+                # Still in flight, a crash now must not leave it behind the stored cursor
+                settled = False
+        
+        if settled_index is not None:
+            # Both cursors only pass stored messages: the next poll lists the ones handled now once
+            # more and moves on once they are stored. Webhook messages are stored by SID only, this
+            # is what moves the stored cursor past them.
+            self._advance_cursor(conversation_sid, settled_index)
+            self.message_store.advance_cursor(conversation_sid, settled_index)
         
         if not messages_to_process:
-            print("No new messages to process.")
             return []
         
-        # Process the messages
+        # Only look up details for messages whose list payload lacks body and media
+        messages_to_process = self._fill_missing_details(conversation_sid, messages_to_process)
+        
+        # Process the messages in the order they were sent
         for message in messages_to_process:
-            # Try to fetch message details directly from API
-            message_detail = self.fetch_message_detail(message.sid)
-            if message_detail:
-                # Use the detailed message object with more information
-                message = message_detail
-            
-            # Continue with regular processing...
             self._process_message(message)
         
         return messages_to_process
 
+    def _list_messages_after(self, conversation_sid, cursor, limit):
+        """List messages with an index above the cursor, newest pages first, returned oldest first
+
+        With a cursor every newer message is returned, however many there
+        are, so none is skipped after downtime; limit only caps the listing
+        without a cursor.
+        """
+        # Small pages when we have a cursor - usually only a message or two is new
+        page_size = min(limit, self.cursor_page_size) if cursor is not None else limit
+        page = self.client.conversations.v1.services(self.service_sid).conversations(
+            conversation_sid
+        ).messages.page(order='desc', page_size=page_size)
+        self._count_api_call()
+        
+        messages = []
+        while page is not None:
+            for message in page:
+                if cursor is not None and message.index is not None and message.index <= cursor:
+                    # Everything from here on was seen in an earlier cycle
+                    return list(reversed(messages))
+                messages.append(message)
+                if cursor is None and len(messages) >= limit:
+                    return list(reversed(messages))
+            
+            page = page.next_page()
+            if page is not None:
+                self._count_api_call()
+        
+        return list(reversed(messages))
+
+    def _fill_missing_details(self, conversation_sid, messages):
+        """Replace messages lacking body and media with their detail, fetched concurrently"""
+        incomplete = [
+            position for position, message in enumerate(messages)
+            if not getattr(message, 'body', None) and not getattr(message, 'media', None)
+        ]
+        if not incomplete:
+            return messages
+        
+        with ThreadPoolExecutor(max_workers=min(len(incomplete), self.detail_fetch_workers)) as executor:
+            details = list(executor.map(lambda position: self.fetch_message_detail(messages[position].sid, conversation_sid), incomplete))
+        
+        messages = list(messages)
+        for position, detail in zip(incomplete, details):
+            if detail:
+                # Use the detailed message object with more information
+                messages[position] = detail
+        return messages
+
+    def _advance_cursor(self, conversation_sid, index):
+        """Move the conversation's high-water mark forward to the given message index"""
+        if index is None:
+            return
+        with self._processed_lock:
+            if index > self.message_cursors.get(conversation_sid, -1):
+                self.message_cursors[conversation_sid] = index
+
+    def _count_api_call(self):
+        """Count one REST call for the current poll cycle"""
+        with self._processed_lock:
+            self.poll_stats["last_cycle_api_calls"] += 1
+            self.poll_stats["api_calls"] += 1
+
+    def _report_poll_cycle(self):
+        """Print the number of API calls the last poll cycle needed"""
+        print(f"📊 Poll cycle {self.poll_stats['cycles']}: {self.poll_stats['last_cycle_api_calls']} API call(s), "
+              f"{self.poll_stats['api_calls']} in total")
+        if self.worker_pool:
+            pool_stats = self.worker_pool.stats()
+            print(f"📊 Workers: {pool_stats['queued']} queued, {pool_stats['completed']} done, "
+                  f"avg wait {pool_stats['avg_wait_seconds']:.2f}s, max wait {pool_stats['max_wait_seconds']:.2f}s")
+
+    def _claim_message(self, message_sid):
+        """Mark a message SID as in flight, returns False if it was already processed or is being processed"""
+        with self._processed_lock:
+            if message_sid in self.last_processed_messages or self.message_store.contains(message_sid):
+                return False
+            self.last_processed_messages.add(message_sid)
+            return True
+
+    @staticmethod
+    def message_from_webhook(event):
+        """Build a message object from an onMessageAdded webhook payload
+
+        The object exposes the same attributes as the REST message resource
+        (sid, index, author, body, media, conversation_sid, date_created),
+        so handle_message can treat webhook and polled messages alike.
+        """
+        media = []
+        raw_media = event.get('Media')
+        if raw_media:
+            try:
+                media = [
+                    {
+                        'sid': item.get('Sid'),
+                        'content_type': item.get('ContentType', 'unknown'),
+                        'filename': item.get('Filename'),
+                        'size': item.get('Size'),
+                    }
+                    for item in json.loads(raw_media)
+                ]
+            except (ValueError, AttributeError):
+                print(f"⚠️ Could not parse media in webhook event: {raw_media}")
+
+        index = event.get('Index')
+        return SimpleNamespace(
+            from_webhook=True,
+            sid=event.get('MessageSid'),
+            index=int(index) if index not in (None, '') else None,
+            author=event.get('Author'),
+            body=event.get('Body') or None,
+            media=media,
+            conversation_sid=event.get('ConversationSid'),
+            date_created=event.get('DateCreated'),
+        )
+
+    def handle_webhook_event(self, event):
+        """Process a verified Conversations webhook event, returns True if a message was dispatched"""
+        if event.get('EventType') != 'onMessageAdded':
+            return False
+
+        message = self.message_from_webhook(event)
+        if not message.sid or not self._claim_message(message.sid):
+            # Already handled, e.g. by the reconciliation poll
+            return False
+
+        print(f"📨 Webhook message received: {message.sid}")
+        if message.conversation_sid:
+            # Reconciliation polling covers every conversation that has talked to the bot,
+            # the index entry brings it back into the poll after a restart
+            with self._processed_lock:
+                self.active_conversations.add(message.conversation_sid)
+            if message.author and message.author.startswith("whatsapp:"):
+                self.conversation_index.set(message.author, message.conversation_sid)
+            if message.index is not None and message.conversation_sid not in self.message_cursors:
+                # New to the poll: start just below this message rather than answering the old history
+                self._advance_cursor(message.conversation_sid, message.index - 1)
+        # An existing cursor is left alone: an earlier message whose event got lost must still be found by the poll
+        self._process_message(message)
+        return True
+
     def _process_message(self, message):
         """Internal method to process a single message"""
-        # If a callback function is provided, call it with the message
-        if self.message_callback:
-            self.message_callback(message)
+        if self.worker_pool:
+            # Keyed by conversation so each conversation keeps its message order
+            key = getattr(message, 'conversation_sid', None) or getattr(message, 'author', None) or message.sid
+            self.worker_pool.submit(key, self._handle_message, message)
+        else:
+            self._handle_message(message)
+
+    def _handle_message(self, message):
+        """Run the message callback and record the message as processed"""
+        try:
+            # If a callback function is provided, call it with the message
+            if self.message_callback:
+                self.message_callback(message)
+        finally:
+            # Only persist once handled, so a crash mid-message reprocesses it after restart
+            self._mark_processed(message)
+
+    def _mark_processed(self, message):
+        """Persist a message as processed and release its in-flight claim"""
+        conversation_sid = getattr(message, 'conversation_sid', None) or (
+            self.conversation.sid if self.conversation else None
+        )
+        # Only polled messages move the stored cursor, everything below it was listed. A webhook
+        # message may have overtaken an undelivered earlier one, its SID alone prevents a rerun.
+        index = None if getattr(message, 'from_webhook', False) else getattr(message, 'index', None)
+        self.message_store.mark_processed(message.sid, conversation_sid, index)
+        with self._processed_lock:
+            self.last_processed_messages.discard(message.sid)
+
+    def bootstrap_history(self, limit=50):
+        """On the very first start, mark the existing history as handled without answering it"""
+        if not self.conversation:
+            print("No conversation available. Run setup_conversation() first.")
+            return []
+        
+        conversation_sid = self.conversation.sid
+        if self.message_store.has_history(conversation_sid):
+            # Later starts resume from the stored cursor instead
+            return []
+        
+        return self._mark_history_processed(conversation_sid, limit)
+
+    def _mark_history_processed(self, conversation_sid, limit):
+        """Record the last 'limit' messages of a conversation as processed and start the cursor there"""
+        messages = self._list_messages_after(conversation_sid, None, limit)
+        for message in messages:
+            self.message_store.mark_processed(message.sid, conversation_sid, message.index)
+            self._advance_cursor(conversation_sid, message.index)
+        return messages
 
     def poll_for_new_messages(self, interval=5, limit=20, reset_history=False):
         """Polls for new messages every 'interval' seconds"""
@@ -185,12 +469,13 @@ class WhatsAppBot:
         except KeyboardInterrupt:
             print("\nStopped polling for messages.")
 
-    def fetch_message_detail(self, message_sid):
+    def fetch_message_detail(self, message_sid, conversation_sid=None):
         """Fetch detailed message information directly from the API"""
+        self._count_api_call()
         try:
             # Get message detail from the Conversations API
             message_detail = self.client.conversations.v1.services(self.service_sid).conversations(
-                self.conversation.sid
+                conversation_sid or self.conversation.sid
             ).messages(message_sid).fetch()
             
             return message_detail
@@ -204,7 +489,7 @@ if __name__ == "__main__":
     bot.setup_conversation()
     
     # Test message
-    # bot.send_message("Hello from the WhatsApp Bot!")
+    # bot.send_message("Hello from the WhatsApp Bot!").result()
     
     # Start polling for new messages every 5 seconds
     bot.poll_for_new_messages(5)
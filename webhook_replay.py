@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import requests
+from dotenv import load_dotenv
+from twilio.request_validator import RequestValidator
+
+# Local fake for Twilio: POSTs recorded onMessageAdded events to the webhook,
+# signed with the same auth token the Flask app validates against.
+#
+#   python webhook_replay.py                      -> replays the built-in sample events
+#   python webhook_replay.py events.json [url]    -> replays a recorded list of events
+
+load_dotenv()
+
+DEFAULT_URL = "http://localhost:3007/whatsapp/webhook"
+
+SAMPLE_EVENTS = [
+    {
+        "EventType": "onMessageAdded",
+        "ChatServiceSid": "ISXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX",
+        "ConversationSid": "CHXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX",
+        "MessageSid": "IMXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX01",
+        "Index": "0",
+        "Author": "whatsapp:+491700000000",
+        "Body": "tomatoes, chicken, pasta",
+        "Source": "WHATSAPP",
+        "DateCreated": "2025-01-01T12:00:00.000Z",
+    },
+    {
+        "EventType": "onMessageAdded",
+        "ChatServiceSid": "ISXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX",
+        "ConversationSid": "CHXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX",
+        "MessageSid": "IMXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX02",
+        "Index": "1",
+        "Author": "whatsapp:+491700000000",
+        "Body": "2",
+        "Source": "WHATSAPP",
+        "DateCreated": "2025-01-01T12:00:30.000Z",
+    },
+]
+
+
+def replay_events(events, url=DEFAULT_URL):
+    """POST each event to the webhook with a valid X-Twilio-Signature header"""
+    auth_token = os.environ.get("twilio_auth_token")
+    if not auth_token:
+        print("twilio_auth_token is not set, the webhook would reject the requests.")
+        return []
+
+    validator = RequestValidator(auth_token)
+    # The signature must be computed for the URL the app validates against
+    signed_url = os.environ.get("webhook_public_url") or url
+
+    results = []
+    for event in events:
+        params = {key: str(value) for key, value in event.items()}
+        signature = validator.compute_signature(signed_url, params)
+        response = requests.post(url, data=params, headers={"X-Twilio-Signature": signature}, timeout=10)
+        print(f"{params.get('MessageSid')}: {response.status_code}")
+        results.append(response.status_code)
+
+    return results
+
+
+if __name__ == "__main__":
+    events = SAMPLE_EVENTS
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            events = json.load(f)
+    target_url = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_URL
+    replay_events(events, target_url)
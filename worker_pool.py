@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+import zlib
+
+
+class ConversationWorkerPool:
+    """Fixed pool of worker threads with one bounded queue per worker
+
+    Tasks are routed by key (e.g. the conversation SID): the same key always
+    lands on the same worker, so messages of one conversation are handled in
+    order while different conversations run in parallel. When a worker's
+    queue is full, submit() blocks (backpressure) until there is room or the
+    timeout expires, in which case queue.Full is raised.
+    """
+
+    _STOP = object()
+
+    def __init__(self, num_workers=4, queue_size=100, submit_timeout=None, name="worker"):
+        self.num_workers = num_workers
+        self.submit_timeout = submit_timeout
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(num_workers)]
+
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        self._threads = []
+        for worker_id, task_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._run, args=(task_queue,), name=f"{name}-{worker_id}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _queue_for(self, key):
+        """Pick the worker queue for a key, stable for the lifetime of the process"""
+        return self._queues[zlib.crc32(str(key).encode("utf-8")) % self.num_workers]
+
+    def submit(self, key, func, *args):
+        """Queue func(*args) on the worker owning key, blocking while that worker is full"""
+        try:
+            self._queue_for(key).put((time.monotonic(), func, args), timeout=self.submit_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise
+        with self._stats_lock:
+            self._submitted += 1
+
+    def _run(self, task_queue):
+        """Worker loop: execute queued tasks in order until stopped"""
+        while True:
+            task = task_queue.get()
+            if task is self._STOP:
+                task_queue.task_done()
+                return
+
+            queued_at, func, args = task
+            wait = time.monotonic() - queued_at
+            with self._stats_lock:
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            try:
+                func(*args)
+                with self._stats_lock:
+                    self._completed += 1
+            except Exception as e:
+                print(f"❌ Error in {threading.current_thread().name}: {e}")
+                with self._stats_lock:
+                    self._failed += 1
+            finally:
+                task_queue.task_done()
+
+    def stats(self):
+        """Return queue depth and wait-time metrics"""
+        with self._stats_lock:
+            started = self._completed + self._failed
+            return {
+                "queue_depths": [task_queue.qsize() for task_queue in self._queues],
+                "queued": sum(task_queue.qsize() for task_queue in self._queues),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": self._total_wait / started if started else 0.0,
+                "max_wait_seconds": self._max_wait,
+            }
+
+    def shutdown(self, wait=True):
+        """Stop all workers after the tasks already queued"""
+        for task_queue in self._queues:
+            task_queue.put(self._STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()